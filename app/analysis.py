@@ -0,0 +1,60 @@
+from functools import cached_property
+from app import nlp
+from app.metrics import STAGE_SECONDS
+from app.sections import SectionIndex
+
+
+def segment_text(segment):
+    return '\n'.join(text for text in (segment['text'], segment.get('notes')) if text)
+
+
+class AnalysisContext:
+    # Each expensive NLTK stage runs lazily and at most once per document, whichever parser method needs it first
+    def __init__(self, text, stop_words):
+        self.text = text
+        self.stop_words = stop_words
+        self.key_phrases = {}
+        self.summaries = {}
+        # Raw VADER valence sums, when they are already known (one per segment)
+        self.valences = None
+
+    @classmethod
+    def from_segments(cls, segments, stop_words):
+        # Built from the sentences, tokens, tags and valences stored per page or slide,
+        # so a document is analyzed again without tokenizing or tagging anything
+        context = cls('\n'.join(text for text in map(segment_text, segments) if text), stop_words)
+        words = [word for segment in segments for word in segment['tokens']]
+        context.__dict__['sentences'] = [sentence for segment in segments for sentence in segment['sentences']]
+        context.__dict__['words'] = words
+        context.__dict__['tagged_words'] = list(zip(words, [tag for segment in segments for tag in segment['tags']]))
+        context.valences = [segment['valence'] for segment in segments]
+        return context
+
+    @cached_property
+    def lower(self):
+        return self.text.lower()
+
+    @cached_property
+    def lines(self):
+        return self.lower.split('\n')
+
+    @cached_property
+    def sections(self):
+        return SectionIndex(self.lines)
+
+    @cached_property
+    def sentences(self):
+        with STAGE_SECONDS.time(stage='sent_tokenize'):
+            return nlp.sent_tokenize(self.text.strip())
+
+    @cached_property
+    def words(self):
+        with STAGE_SECONDS.time(stage='word_tokenize'):
+            words = nlp.word_tokenize(self.lower)
+        return [word for word in words if (word.isalnum() or '-' in word) and word not in self.stop_words]
+
+    @cached_property
+    def tagged_words(self):
+        words = self.words
+        with STAGE_SECONDS.time(stage='pos_tag'):
+            return nlp.pos_tag(words)
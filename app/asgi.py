@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import time
+from quart import Quart, Request, render_template, request, jsonify, Response, g, make_response
+from dotenv import load_dotenv
+import redis.asyncio as redis
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+load_dotenv()
+
+from app.models import PitchDeck
+from app.utils import save_upload, save_upload_async
+from app.job_status import get_job_async, job_channel, FINAL_STATES
+from app.routes import (ApiError, EVENT_STREAM_HEADERS, new_job, new_upload, file_extension, format_event, job_event,
+                        queue_depths, metrics_body, dashboard_cursor, split_page, search_params, search_response,
+                        form_file, stream_filename, upload_errors, queue_job, queued_response, duplicate_response)
+from app.config import get_config
+from app import cache, metrics, connections
+
+# The API served by an ASGI server: the routes of app.routes on one event loop, with pooled asyncpg and
+# redis.asyncio connections, so requests waiting on Redis, PostgreSQL or a slow upload do not each hold a thread.
+# The database is set up beforehand by python -m app.bootstrap; this app only connects to it.
+# python -m app.asgi, or hypercorn 'app.asgi:create_app()'
+
+
+def async_database_uri(uri):
+    return uri.replace('postgresql://', 'postgresql+asyncpg://', 1)
+
+
+async def dashboard_page(session, redis_client, limit, before, size_limit):
+    # PitchDeck.dashboard_page, awaiting the cache and the database
+    if not await redis_client.exists(cache.DASHBOARD_WARM):
+        await warm_cache(session, redis_client, size_limit)
+    cached = await cache.run_async(cache.read_page_steps(redis_client, limit, before))
+    if cached is None:
+        rows = await session.scalars(PitchDeck.page_statement(limit, before))
+        return [pitch_deck.to_summary() for pitch_deck in rows]
+
+    missing = cache.missing_documents(cached)
+    summaries = []
+    if missing:
+        rows = await session.scalars(PitchDeck.summaries_statement(missing))
+        summaries = [pitch_deck.to_summary() for pitch_deck in rows]
+        await cache.run_async(cache.repair_steps(redis_client, missing, summaries, size_limit))
+    return cache.merge_page(cached, summaries)
+
+
+async def warm_cache(session, redis_client, size_limit):
+    rows = await session.scalars(PitchDeck.page_statement(size_limit))
+    return await cache.run_async(cache.warm_steps(redis_client, [pitch_deck.to_summary() for pitch_deck in rows],
+                                                  size_limit))
+
+
+class JobEvents:
+    # One Redis subscription for every open event stream, instead of a pooled connection held by each of them:
+    # a message is handed to the queues of the streams following that job
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.followers = {}
+        self.pubsub = None
+        self.reader = None
+
+    async def start(self):
+        self.pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.psubscribe(job_channel('*'))
+        self.reader = asyncio.create_task(self.read())
+
+    async def stop(self):
+        self.reader.cancel()
+        await self.pubsub.aclose()
+
+    async def read(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(timeout=None)
+            except redis.ConnectionError as e:
+                # The next read reconnects and subscribes again
+                print(f"Job event subscription lost: {e}")
+                await asyncio.sleep(1)
+                continue
+            if message is not None:
+                for queue in self.followers.get(message['channel'], ()):
+                    queue.put_nowait(message['data'])
+
+    def follow(self, job_id):
+        queue = asyncio.Queue()
+        self.followers.setdefault(job_channel(job_id), set()).add(queue)
+        return queue
+
+    def unfollow(self, job_id, queue):
+        followers = self.followers.get(job_channel(job_id), set())
+        followers.discard(queue)
+        if not followers:
+            self.followers.pop(job_channel(job_id), None)
+
+
+def create_app():
+    app = Quart(__name__)
+    app.config.from_object(get_config())
+
+    class UploadRequest(Request):
+        # Quart sizes a body's buffer limit when the request arrives, before routing, so the larger streaming
+        # limit is given here to the one route that writes its body to disk as it reads it. Every other body,
+        # the multipart form included, stays within MAX_CONTENT_LENGTH.
+        def __init__(self, method, scheme, path, *args, **kwargs):
+            if path == '/api/upload/stream':
+                kwargs['max_content_length'] = app.config['STREAM_MAX_CONTENT_LENGTH']
+            super().__init__(method, scheme, path, *args, **kwargs)
+
+    app.request_class = UploadRequest
+
+    db_uri = app.config.get('SQLALCHEMY_DATABASE_URI') or os.getenv('DATABASE_URL')
+    if not db_uri:
+        raise ValueError("DATABASE_URL or SQLALCHEMY_DATABASE_URI must be set")
+    engine = create_async_engine(async_database_uri(db_uri),
+                                 **connections.engine_options(app.config, async_driver=True))
+    connections.watch_engine(engine, app.config['DB_POOL_SIZE'] + app.config['DB_MAX_OVERFLOW'])
+    # Rows stay readable after commit, since to_summary runs once the session is closed
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    redis_client = connections.async_redis_client(app.config)
+    size_limit = app.config['DASHBOARD_CACHE_SIZE']
+    job_events_hub = JobEvents(redis_client)
+
+    @app.before_serving
+    async def connect():
+        try:
+            await redis_client.ping()
+            print("Successfully connected to Redis")
+        except redis.ConnectionError as e:
+            print(f"Failed to connect to Redis: {e}")
+            raise
+        await job_events_hub.start()
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        try:
+            async with sessions() as session:
+                print(f"Warmed dashboard cache with {await warm_cache(session, redis_client, size_limit)} documents")
+        except Exception as e:
+            # The dashboard warms the cache itself on first use
+            print(f"Dashboard cache not warmed: {e}")
+
+    @app.after_serving
+    async def disconnect():
+        await job_events_hub.stop()
+        await engine.dispose()
+        await redis_client.aclose()
+
+    @app.errorhandler(ApiError)
+    async def api_error(e):
+        return e.response()
+
+    @app.before_request
+    async def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    async def record_request(response):
+        endpoint = request.endpoint or 'unknown'
+        metrics.HTTP_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        if 'request_start' in g:
+            metrics.HTTP_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+        return response
+
+    @app.route('/metrics')
+    async def metrics_endpoint():
+        pipe = redis_client.pipeline()
+        queue_depths(pipe)
+        return Response(metrics_body(await pipe.execute()), content_type=metrics.CONTENT_TYPE)
+
+    @app.route('/')
+    async def dashboard():
+        before = dashboard_cursor(request.args)
+        try:
+            page_size = app.config['DASHBOARD_PAGE_SIZE']
+            async with sessions() as session:
+                documents = await dashboard_page(session, redis_client, page_size + 1, before, size_limit)
+            documents, next_cursor = split_page(documents, page_size)
+            return await render_template('dashboard.html', data=documents, next_cursor=next_cursor)
+        except Exception as e:
+            print(f"Dashboard data fetch error: {e}")
+            return jsonify({'error': 'Internal server error'}), 500
+
+    @app.route('/api/documents/<int:document_id>')
+    async def document_detail(document_id):
+        async with sessions() as session:
+            pitch_deck = await session.get(PitchDeck, document_id)
+        if pitch_deck is None:
+            return jsonify({'error': 'Document not found'}), 404
+        return jsonify(pitch_deck.to_dict())
+
+    @app.route('/api/search')
+    async def search():
+        params = search_params(request.args, app.config, engine.dialect.name)
+        async with sessions() as session:
+            results = (await session.execute(PitchDeck.search_statement(**params))).all()
+        return jsonify(search_response(params, results))
+
+    @app.route('/api/jobs/<job_id>')
+    async def job_status(job_id):
+        job = await get_job_async(redis_client, job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+
+    @app.route('/api/jobs/<job_id>/events')
+    async def job_events(job_id):
+        queue = job_events_hub.follow(job_id)
+        # Read after following, so a change made in between is still delivered
+        job = await get_job_async(redis_client, job_id)
+        if job is None:
+            job_events_hub.unfollow(job_id, queue)
+            return jsonify({'error': 'Job not found'}), 404
+
+        async def events():
+            try:
+                state = job['state']
+                yield format_event(state, json.dumps(job))
+                while state not in FINAL_STATES:
+                    try:
+                        data = await asyncio.wait_for(queue.get(), app.config['JOB_EVENTS_KEEPALIVE'])
+                    except asyncio.TimeoutError:
+                        data = None
+                    state, event = job_event(data, state)
+                    yield event
+            finally:
+                job_events_hub.unfollow(job_id, queue)
+
+        response = await make_response(events(), {'Content-Type': 'text/event-stream', **EVENT_STREAM_HEADERS})
+        # The stream stays open until the job finishes, however long that takes
+        response.timeout = None
+        return response
+
+    @app.route('/api/upload', methods=['POST'])
+    async def upload_file():
+        file, filename = form_file(await request.files)
+        job_id, file_path = new_upload(app.config, filename)
+        with upload_errors():
+            # The form parser already spooled the file; copying it out is blocking file I/O
+            content_hash, size, _ = await asyncio.to_thread(save_upload, file.stream, file_path)
+            return await queue_upload(job_id, filename, file_path, content_hash, size)
+
+    @app.route('/api/upload/stream', methods=['POST'])
+    async def upload_stream():
+        # The raw request body is the file, written to disk chunk by chunk as it arrives
+        filename = stream_filename(request)
+        max_size = app.config['STREAM_MAX_CONTENT_LENGTH']
+        job_id, file_path = new_upload(app.config, filename)
+        with upload_errors(max_size):
+            # The first bytes are checked against the extension before anything is written
+            content_hash, size, _ = await save_upload_async(request.body, file_path, max_size=max_size,
+                                                            file_type=file_extension(filename))
+            print(f"Received {size} bytes for {filename}")
+            return await queue_upload(job_id, filename, file_path, content_hash, size)
+
+    async def queue_upload(job_id, filename, file_path, content_hash, size):
+        async with sessions() as session:
+            existing = (await session.scalars(PitchDeck.find_by_hash_statement(content_hash))).first()
+            if existing:
+                duplicate = existing.clone(filename)
+                session.add(duplicate)
+                await session.commit()
+        if existing:
+            await cache.run_async(cache.write_documents_steps(redis_client, [duplicate.to_summary()], size_limit))
+            await asyncio.to_thread(os.remove, file_path)
+            return duplicate_response(existing, duplicate, filename)
+
+        job = new_job(job_id, filename, file_path, content_hash, size, app.config)
+        pipe = redis_client.pipeline()
+        queue_job(pipe, job, app.config)
+        await pipe.execute()
+        return queued_response(job)
+
+    return app
+
+
+if __name__ == '__main__':
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config as HypercornConfig
+
+    app = create_app()
+    hypercorn_config = HypercornConfig()
+    hypercorn_config.bind = [app.config['ASGI_BIND']]
+    print(f"Starting ASGI server on {app.config['ASGI_BIND']}")
+    asyncio.run(serve(app, hypercorn_config))
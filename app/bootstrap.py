@@ -0,0 +1,88 @@
+import argparse
+import logging
+import os
+import sys
+from urllib.parse import urlparse
+import psycopg2
+from psycopg2 import sql
+from flask import Flask
+from sqlalchemy import inspect
+from dotenv import load_dotenv
+from app.models import db, upgrade_schema
+from app.config import get_config
+from app import connections
+
+# One-off database setup, run before the API and the workers start: creates the database if it is missing, then
+# the tables, then applies SCHEMA_UPGRADES. Safe to run again. python -m app.bootstrap
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def create_database(db_uri):
+    db_url = urlparse(db_uri)
+    db_name = db_url.path[1:]  # Remove the leading '/'
+    # Connect to the server's default 'postgres' database, since the one to create may not exist yet
+    conn = psycopg2.connect(
+        dbname='postgres',
+        user=db_url.username,
+        password=db_url.password,
+        host=db_url.hostname,
+        port=db_url.port
+    )
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (db_name,))
+            if cursor.fetchone():
+                logger.info(f"Database {db_name} already exists")
+                return False
+            logger.info(f"Creating database {db_name}")
+            cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(db_name)))
+            return True
+    finally:
+        conn.close()
+
+
+def create_tables(app):
+    with app.app_context():
+        logger.info("Creating database tables")
+        db.create_all()
+        upgrade_schema()
+        logger.info("Database tables created successfully")
+
+
+def missing_tables():
+    # For the tools that only use the schema set up here, so they stop at once instead of failing mid-run
+    existing = set(inspect(db.engine).get_table_names())
+    return [table for table in db.metadata.tables if table not in existing]
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Create the database, its tables and indexes")
+    arg_parser.parse_args(argv)
+
+    load_dotenv()
+    app = Flask(__name__)
+    app.config.from_object(get_config())
+    db_uri = app.config.get('SQLALCHEMY_DATABASE_URI') or os.getenv('DATABASE_URL')
+    if not db_uri:
+        raise ValueError("DATABASE_URL or SQLALCHEMY_DATABASE_URI must be set")
+    app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
+    # Building an index over a large existing table can take longer than any request may
+    app.config['DB_STATEMENT_TIMEOUT_MS'] = 0
+
+    if urlparse(db_uri).scheme.startswith('postgresql'):
+        create_database(db_uri)
+    connections.init_db(app)
+    create_tables(app)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import json
+from datetime import datetime, timedelta, UTC
+from flask import current_app
+
+# Newest documents' dashboard summaries, written through on every save:
+# a sorted set of ids scored by upload time, plus one hash per document
+DASHBOARD_INDEX = 'dashboard:index'
+# 'complete' when the index holds every document, 'partial' once older documents were left out or trimmed
+DASHBOARD_WARM = 'dashboard:warm'
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def document_key(document_id):
+    return f"dashboard:doc:{document_id}"
+
+
+def member(document_id):
+    # Zero padding makes Redis' lexical order of equal scores match the id order
+    return f"{document_id:012d}"
+
+
+def score(upload_date):
+    if upload_date.tzinfo is None:
+        upload_date = upload_date.replace(tzinfo=UTC)
+    # Whole microseconds stay exact in a Redis double score
+    return (upload_date - EPOCH) // timedelta(microseconds=1)
+
+
+def cache_size():
+    return current_app.config['DASHBOARD_CACHE_SIZE']
+
+
+def queue_documents(pipe, summaries):
+    for summary in summaries:
+        pipe.hset(document_key(summary['id']), mapping={k: json.dumps(v) for k, v in summary.items()})
+        pipe.zadd(DASHBOARD_INDEX, {member(summary['id']): score(datetime.fromisoformat(summary['upload_date']))})
+
+
+# Each operation below is written once, as a generator that yields the Redis pipelines it needs and is sent back
+# their results; run() drives it with a redis client and run_async() with a redis.asyncio one.
+def run(steps):
+    results = None
+    try:
+        while True:
+            results = steps.send(results).execute()
+    except StopIteration as done:
+        return done.value
+
+
+async def run_async(steps):
+    results = None
+    try:
+        while True:
+            results = await steps.send(results).execute()
+    except StopIteration as done:
+        return done.value
+
+
+def write_documents_steps(redis_client, summaries, size_limit):
+    pipe = redis_client.pipeline()
+    queue_documents(pipe, summaries)
+    pipe.zcard(DASHBOARD_INDEX)
+    size = (yield pipe)[-1]
+    if size > size_limit:
+        yield from trim_steps(redis_client, size - size_limit)
+
+
+def refresh_documents_steps(redis_client, summaries):
+    # Rewrites the summaries of documents that are cached, without adding older ones to the index
+    pipe = redis_client.pipeline()
+    for summary in summaries:
+        pipe.zscore(DASHBOARD_INDEX, member(summary['id']))
+    cached = [summary for summary, cached_score in zip(summaries, (yield pipe)) if cached_score is not None]
+    if cached:
+        pipe = redis_client.pipeline()
+        for summary in cached:
+            pipe.hset(document_key(summary['id']), mapping={k: json.dumps(v) for k, v in summary.items()})
+        yield pipe
+    return len(cached)
+
+
+def queue_removal(pipe, members):
+    pipe.zrem(DASHBOARD_INDEX, *members)
+    pipe.delete(*[document_key(int(m)) for m in members])
+
+
+def trim_steps(redis_client, count):
+    pipe = redis_client.pipeline()
+    pipe.zrange(DASHBOARD_INDEX, 0, count - 1)
+    oldest = (yield pipe)[0]
+    if oldest:
+        pipe = redis_client.pipeline()
+        queue_removal(pipe, oldest)
+        pipe.set(DASHBOARD_WARM, 'partial', xx=True)
+        yield pipe
+
+
+def remove_document_steps(redis_client, document_id):
+    pipe = redis_client.pipeline()
+    queue_removal(pipe, [member(document_id)])
+    yield pipe
+
+
+def warm_steps(redis_client, summaries, size_limit):
+    # summaries are the newest size_limit documents. Rebuilding the index from them also drops entries for rows
+    # deleted behind the cache's back
+    pipe = redis_client.pipeline()
+    pipe.zrange(DASHBOARD_INDEX, 0, -1)
+    stale = stale_members((yield pipe)[0], summaries)
+    if stale:
+        pipe = redis_client.pipeline()
+        queue_removal(pipe, stale)
+        yield pipe
+    yield from write_documents_steps(redis_client, summaries, size_limit)
+    pipe = redis_client.pipeline()
+    pipe.set(DASHBOARD_WARM, 'partial' if len(summaries) >= size_limit else 'complete')
+    yield pipe
+    return len(summaries)
+
+
+def stale_members(old_members, summaries):
+    current = {member(summary['id']) for summary in summaries}
+    return [m for m in old_members if m not in current]
+
+
+def queue_page(pipe, limit, before=None):
+    if before:
+        before_score = score(before[0])
+        pipe.zrevrangebyscore(DASHBOARD_INDEX, before_score, before_score)
+        pipe.zrevrangebyscore(DASHBOARD_INDEX, f"({before_score}", '-inf', start=0, num=limit)
+    else:
+        pipe.zrevrange(DASHBOARD_INDEX, 0, limit - 1)
+    pipe.get(DASHBOARD_WARM)
+
+
+def page_members(results, limit, before=None):
+    state = results[-1]
+    if before:
+        ties = [m for m in results[0] if int(m) < before[1]]
+        members = (ties + results[1])[:limit]
+    else:
+        members = results[0]
+    # A short page from a partial index may be missing older rows that only the database has
+    if state != 'complete' and len(members) < limit:
+        return None
+    return members
+
+
+def decode_documents(members, hashes):
+    return [(int(m), {k: json.loads(v) for k, v in fields.items()} if fields else None)
+            for m, fields in zip(members, hashes)]
+
+
+def read_page_steps(redis_client, limit, before=None):
+    # Returns None when the cache cannot answer this page and the database has to
+    pipe = redis_client.pipeline()
+    queue_page(pipe, limit, before)
+    members = page_members((yield pipe), limit, before)
+    if members is None:
+        return None
+
+    pipe = redis_client.pipeline()
+    for m in members:
+        pipe.hgetall(document_key(int(m)))
+    return decode_documents(members, (yield pipe))
+
+
+def missing_documents(cached):
+    return [document_id for document_id, summary in cached if summary is None]
+
+
+def repair_steps(redis_client, missing, summaries, size_limit):
+    # Entries whose hash was evicted are written again from the database's summaries; ids that no longer exist
+    # are dropped from the index
+    found = {summary['id'] for summary in summaries}
+    gone = [member(document_id) for document_id in missing if document_id not in found]
+    if gone:
+        pipe = redis_client.pipeline()
+        queue_removal(pipe, gone)
+        yield pipe
+    if summaries:
+        yield from write_documents_steps(redis_client, summaries, size_limit)
+
+
+def merge_page(cached, summaries):
+    repaired = {summary['id']: summary for summary in summaries}
+    return [summary or repaired[document_id] for document_id, summary in cached
+            if summary or document_id in repaired]
+
+
+# The operations as the Flask app, the workers and the command-line tools call them, sized by DASHBOARD_CACHE_SIZE
+def write_documents(redis_client, summaries):
+    return run(write_documents_steps(redis_client, summaries, cache_size()))
+
+
+def refresh_documents(redis_client, summaries):
+    return run(refresh_documents_steps(redis_client, summaries))
+
+
+def remove_document(redis_client, document_id):
+    return run(remove_document_steps(redis_client, document_id))
+
+
+def warm(redis_client, summaries):
+    return run(warm_steps(redis_client, summaries, cache_size()))
+
+
+def read_page(redis_client, limit, before=None):
+    return run(read_page_steps(redis_client, limit, before))
+
+
+def repair(redis_client, missing, summaries):
+    return run(repair_steps(redis_client, missing, summaries, cache_size()))
@@ -5,6 +5,8 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secure-secret-key')
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 10 * 1024 * 1024))  # 10MB default
+    # /api/upload/stream never buffers the body, so it can accept much larger files
+    STREAM_MAX_CONTENT_LENGTH = int(os.getenv('STREAM_MAX_CONTENT_LENGTH', 500 * 1024 * 1024))
 
     SQLALCHEMY_DATABASE_URI = (
         f"postgresql://{os.getenv('POSTGRES_USER', 'shakira')}:{os.getenv('POSTGRES_PASSWORD', 'password')}"
@@ -16,6 +18,79 @@ class Config:
     REDIS_PORT = int(os.getenv('REDIS_PORT', '6379'))
     REDIS_DB = int(os.getenv('REDIS_DB', 0))
 
+    # Connection pools, one per process (API, ASGI server, each worker process); see app/connections.py.
+    # Database connections kept open, extra ones allowed under load, and how long a request waits for one
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # seconds before a connection is replaced
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'  # test connections on checkout
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))  # 0 disables it
+    REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+    REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', 10))  # seconds to wait for a free connection
+    REDIS_CONNECT_TIMEOUT = float(os.getenv('REDIS_CONNECT_TIMEOUT', 5))
+    REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30))  # PING idle connections before use
+    # Every open job event stream on the Flask server holds one Redis connection until it ends, taken from a
+    # pool of its own so streams never starve the other requests; streams past the limit are refused
+    REDIS_PUBSUB_MAX_CONNECTIONS = int(os.getenv('REDIS_PUBSUB_MAX_CONNECTIONS', 100))
+    ASGI_BIND = os.getenv('ASGI_BIND', '0.0.0.0:5000')
+
+    DASHBOARD_PAGE_SIZE = int(os.getenv('DASHBOARD_PAGE_SIZE', 50))
+    SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', 50))  # per /api/search page
+    SEARCH_RANK_CANDIDATES = int(os.getenv('SEARCH_RANK_CANDIDATES', 1000))  # newest matches ranked per search
+    DASHBOARD_CACHE_SIZE = int(os.getenv('DASHBOARD_CACHE_SIZE', 1000))  # newest documents kept in Redis
+
+    WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', 1))  # 0 uses one process per CPU core
+    WORKER_RESTART_DELAY = float(os.getenv('WORKER_RESTART_DELAY', 1))
+    WORKER_SHUTDOWN_TIMEOUT = float(os.getenv('WORKER_SHUTDOWN_TIMEOUT', 60))
+    # Finished documents are committed together once this many are ready or the oldest has waited this long
+    WORKER_COMMIT_BATCH_SIZE = int(os.getenv('WORKER_COMMIT_BATCH_SIZE', 50))
+    WORKER_COMMIT_WINDOW_MS = int(os.getenv('WORKER_COMMIT_WINDOW_MS', 500))
+    # Reliable mode keeps every taken job in a per-worker list until its documents are committed
+    WORKER_RELIABLE_QUEUE = os.getenv('WORKER_RELIABLE_QUEUE', 'true').lower() == 'true'
+    JOB_VISIBILITY_TIMEOUT = float(os.getenv('JOB_VISIBILITY_TIMEOUT', 600))  # seconds before an unacknowledged job is re-queued
+    # A running worker renews its leases every third of the timeout, for at most this long per job
+    JOB_LEASE_MAX_TIME = float(os.getenv('JOB_LEASE_MAX_TIME', 3600))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))  # then the job goes to the dead-letter list
+    JOB_REAPER_INTERVAL = float(os.getenv('JOB_REAPER_INTERVAL', 30))
+    # Uploads are queued by size class; a worker serves WORKER_SIZE_CLASSES in proportion to the weights
+    QUEUE_MEDIUM_MIN_BYTES = int(os.getenv('QUEUE_MEDIUM_MIN_BYTES', 2 * 1024 * 1024))
+    QUEUE_LARGE_MIN_BYTES = int(os.getenv('QUEUE_LARGE_MIN_BYTES', 20 * 1024 * 1024))
+    QUEUE_WEIGHTS = {
+        'small': int(os.getenv('QUEUE_WEIGHT_SMALL', 6)),
+        'medium': int(os.getenv('QUEUE_WEIGHT_MEDIUM', 3)),
+        'large': int(os.getenv('QUEUE_WEIGHT_LARGE', 1))
+    }
+    WORKER_SIZE_CLASSES = os.getenv('WORKER_SIZE_CLASSES', 'small,medium,large').split(',')
+    JOB_STATUS_TTL = int(os.getenv('JOB_STATUS_TTL', 24 * 60 * 60))  # seconds a job's state is kept after its last change
+    JOB_EVENTS_KEEPALIVE = float(os.getenv('JOB_EVENTS_KEEPALIVE', 15))  # seconds between comments on an idle event stream
+
+    # Page extraction processes per worker process, only used for PDFs with at least PDF_PARALLEL_MIN_PAGES pages
+    PDF_PARSE_WORKERS = int(os.getenv('PDF_PARSE_WORKERS', 1))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 16))
+    # auto reads PDF text with pypdf and falls back to pdfplumber for the pages where the result looks wrong;
+    # pypdf or pdfplumber use only that one
+    PDF_TEXT_BACKEND = os.getenv('PDF_TEXT_BACKEND', 'auto')
+    # PDFs with at least PDF_BOUNDED_MIN_PAGES pages are read a range of pages at a time. A PDF whose extraction
+    # grows the process by more than PDF_MEMORY_BUDGET_MB or takes longer than PDF_TIME_BUDGET seconds is stored
+    # with status too_large; 0 turns a budget off
+    PDF_BOUNDED_MIN_PAGES = int(os.getenv('PDF_BOUNDED_MIN_PAGES', 100))
+    PDF_MEMORY_BUDGET_MB = int(os.getenv('PDF_MEMORY_BUDGET_MB', 1024))
+    PDF_TIME_BUDGET = int(os.getenv('PDF_TIME_BUDGET', 600))
+    # Same for PPTX slides; speaker notes are analyzed with the slides unless PPTX_INCLUDE_NOTES is false
+    PPTX_PARSE_WORKERS = int(os.getenv('PPTX_PARSE_WORKERS', 1))
+    PPTX_PARALLEL_MIN_SLIDES = int(os.getenv('PPTX_PARALLEL_MIN_SLIDES', 48))
+    PPTX_INCLUDE_NOTES = os.getenv('PPTX_INCLUDE_NOTES', 'true').lower() == 'true'
+
+    SENTIMENT_CACHE_SIZE = int(os.getenv('SENTIMENT_CACHE_SIZE', 10000))  # sentences kept per worker process
+
+    # Opt-in: worker process N serves Prometheus metrics on WORKER_METRICS_PORT + N
+    WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', 0))
+    # Opt-in: keep cProfile stats of the slowest PROFILE_SLOWEST_JOBS sampled jobs in PROFILE_DIR
+    PROFILE_SLOWEST_JOBS = int(os.getenv('PROFILE_SLOWEST_JOBS', 0))
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.1))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
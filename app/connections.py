@@ -0,0 +1,145 @@
+import redis
+import redis.asyncio
+from app.models import db
+from app import metrics
+
+# Database engines and Redis clients for every entry point (API, ASGI server, workers, command-line tools),
+# configured from the DB_* and REDIS_* settings and reported in the pool metrics
+redis_pools = {}
+
+
+def engine_options(config, async_driver=False):
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING']
+    }
+    timeout = config['DB_STATEMENT_TIMEOUT_MS']
+    # A PostgreSQL setting; the SQLite database of the pipeline benchmark runs without it
+    if timeout and config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        # Set on every new connection, so a runaway query is cancelled by the server instead of holding a connection
+        if async_driver:
+            options['connect_args'] = {'server_settings': {'statement_timeout': str(timeout)}}
+        else:
+            options['connect_args'] = {'options': f"-c statement_timeout={timeout}"}
+    return options
+
+
+def init_db(app):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    with app.app_context():
+        watch_engine(db.engine, app.config['DB_POOL_SIZE'] + app.config['DB_MAX_OVERFLOW'])
+
+
+def redis_options(config):
+    return {
+        'host': config['REDIS_HOST'],
+        'port': config['REDIS_PORT'],
+        'db': config['REDIS_DB'],
+        'decode_responses': True,
+        'max_connections': config['REDIS_MAX_CONNECTIONS'],
+        'timeout': config['REDIS_POOL_TIMEOUT'],
+        'socket_connect_timeout': config['REDIS_CONNECT_TIMEOUT'],
+        'socket_keepalive': True,
+        'health_check_interval': config['REDIS_HEALTH_CHECK_INTERVAL']
+    }
+
+
+class CountingPool:
+    # Counts its own connections for the pool metrics, as redis-py keeps them in private attributes that differ
+    # between its sync and asyncio pools and between releases. A forked worker process resets its pool.
+    def __init__(self, **kwargs):
+        self.reset_counts()
+        super().__init__(**kwargs)
+
+    def reset_counts(self):
+        self.opened = set()
+        self.checked_out = set()
+
+    def reset(self):
+        self.reset_counts()
+        super().reset()
+
+    def make_connection(self):
+        connection = super().make_connection()
+        self.opened.add(connection)
+        return connection
+
+    def usage(self):
+        in_use = len(self.checked_out)
+        return in_use, len(self.opened) - in_use
+
+
+class RedisPool(CountingPool, redis.BlockingConnectionPool):
+    def get_connection(self, *args, **kwargs):
+        connection = super().get_connection(*args, **kwargs)
+        self.checked_out.add(connection)
+        return connection
+
+    def release(self, connection):
+        self.checked_out.discard(connection)
+        super().release(connection)
+
+
+class AsyncRedisPool(CountingPool, redis.asyncio.BlockingConnectionPool):
+    async def get_connection(self, *args, **kwargs):
+        connection = await super().get_connection(*args, **kwargs)
+        self.checked_out.add(connection)
+        return connection
+
+    async def release(self, connection):
+        self.checked_out.discard(connection)
+        await super().release(connection)
+
+
+def redis_client(config):
+    # One pool per process and Redis database, shared by every client made from it; a forked worker process
+    # gets fresh connections, redis-py checks the pid. Requests wait for a free connection once all are in use.
+    key = (config['REDIS_HOST'], config['REDIS_PORT'], config['REDIS_DB'])
+    if key not in redis_pools:
+        redis_pools[key] = RedisPool(**redis_options(config))
+    client = redis.Redis(connection_pool=redis_pools[key])
+    watch_redis_pool(redis_pools[key])
+    return client
+
+
+def pubsub_client(config):
+    # Subscriptions keep their connection while a stream is open, so they get a separate pool that fails at once
+    # when full instead of waiting, and never hold a connection the REDIS_MAX_CONNECTIONS pool needs
+    key = ('pubsub', config['REDIS_HOST'], config['REDIS_PORT'], config['REDIS_DB'])
+    if key not in redis_pools:
+        options = redis_options(config)
+        del options['timeout']
+        options['max_connections'] = config['REDIS_PUBSUB_MAX_CONNECTIONS']
+        redis_pools[key] = redis.ConnectionPool(**options)
+    return redis.Redis(connection_pool=redis_pools[key])
+
+
+def async_redis_client(config):
+    pool = AsyncRedisPool(**redis_options(config))
+    watch_redis_pool(pool)
+    return redis.asyncio.Redis(connection_pool=pool)
+
+
+def watch_redis_pool(pool):
+    def collect():
+        in_use, idle = pool.usage()
+        metrics.REDIS_POOL_CONNECTIONS.set(in_use, state='in_use')
+        metrics.REDIS_POOL_CONNECTIONS.set(idle, state='idle')
+        metrics.REDIS_POOL_MAX.set(pool.max_connections)
+
+    metrics.REGISTRY.collect('redis_pool', collect)
+
+
+def watch_engine(engine, max_connections):
+    # Reads engine.pool when scraped, since dispose() (as a forked worker does) replaces the pool
+    def collect():
+        pool = engine.pool
+        metrics.DB_POOL_CONNECTIONS.set(pool.checkedout(), state='in_use')
+        metrics.DB_POOL_CONNECTIONS.set(pool.checkedin(), state='idle')
+        metrics.DB_POOL_MAX.set(max_connections)
+
+    metrics.REGISTRY.collect('db_pool', collect)
@@ -0,0 +1,274 @@
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask
+from dotenv import load_dotenv
+from werkzeug.utils import secure_filename
+from app.models import PitchDeckParser, PitchDeck, DocumentSegment, db
+from app.utils import MAGIC_BYTES, hash_file, sniff_file_type
+from app.config import get_config
+from app import nlp, connections, bootstrap
+
+# Ingests a directory or a zip/tar archive of PDF and PPTX files without the HTTP API or the queue:
+# python -m app.ingest <path> [--processes N] [--batch-size N] [--checkpoint FILE]
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+parser = None
+
+
+def supported(name):
+    return '.' in name and name.rsplit('.', 1)[1].lower() in MAGIC_BYTES
+
+
+def iter_sources(source, spool_dir):
+    # Yields (name, file_path, is_spooled); archive members are copied one at a time into spool_dir,
+    # tar members in stream order so a compressed archive is read only once
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for filename in sorted(files):
+                if supported(filename):
+                    file_path = os.path.join(root, filename)
+                    yield os.path.relpath(file_path, source), file_path, False
+    elif source.lower().endswith('.zip'):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and supported(info.filename):
+                    with archive.open(info) as member:
+                        yield info.filename, spool(member, info.filename, spool_dir), True
+    elif source.lower().endswith(TAR_SUFFIXES):
+        with tarfile.open(source, 'r|*') as archive:
+            for info in archive:
+                if info.isfile() and supported(info.name):
+                    yield info.name, spool(archive.extractfile(info), info.name, spool_dir), True
+    else:
+        raise ValueError(f"{source} is not a directory, .zip or tar archive")
+
+
+def spool(member, name, spool_dir):
+    fd, file_path = tempfile.mkstemp(suffix='.' + name.rsplit('.', 1)[1].lower(), dir=spool_dir)
+    with os.fdopen(fd, 'wb') as f:
+        shutil.copyfileobj(member, f)
+    return file_path
+
+
+def count_sources(source):
+    # Only a directory can be counted up front without reading the whole archive
+    if os.path.isdir(source):
+        return sum(1 for _, _, files in os.walk(source) for filename in files if supported(filename))
+    if source.lower().endswith('.zip'):
+        with zipfile.ZipFile(source) as archive:
+            return sum(1 for info in archive.infolist() if not info.is_dir() and supported(info.filename))
+    return None
+
+
+def init_process(pptx_notes, sentiment_cache_size, pdf_backend):
+    global parser
+    parser = PitchDeckParser(pptx_notes=pptx_notes, sentiment_cache_size=sentiment_cache_size,
+                             pdf_backend=pdf_backend)
+
+
+def analyze_file(name, file_path):
+    # Runs in a pool process; everything returned is plain data, the parent builds and stores the rows
+    try:
+        file_type = name.rsplit('.', 1)[1].lower()
+        content_hash, head = hash_file(file_path)
+        if sniff_file_type(head) != file_type:
+            raise ValueError("File content does not match its format")
+        if file_type == 'pdf':
+            segments, kind = parser.pdf_segments(file_path), 'page'
+        else:
+            segments, kind = parser.pptx_segments(file_path), 'slide'
+        context = parser.segment_context(segments)
+        return {'name': name, 'content_hash': content_hash, 'content': context.text, 'kind': kind,
+                'segments': segments, 'analysis': parser.analyze_content(context)}
+    except Exception as e:
+        return {'name': name, 'error': f"{type(e).__name__}: {e}"}
+
+
+def read_checkpoint(checkpoint_path):
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def write_checkpoint(checkpoint_file, names):
+    checkpoint_file.writelines(f"{name}\n" for name in names)
+    checkpoint_file.flush()
+    os.fsync(checkpoint_file.fileno())
+
+
+def store_batch(results, redis_client):
+    # Returns (stored names, failed (name, error) pairs); one lookup finds every content hash already stored
+    hashes = {result['content_hash'] for result in results}
+    existing = {}
+    for pitch_deck in PitchDeck.query.filter(PitchDeck.content_hash.in_(hashes),
+                                             PitchDeck.status == 'processed').order_by(PitchDeck.id):
+        existing.setdefault(pitch_deck.content_hash, pitch_deck)
+        existing.setdefault((pitch_deck.content_hash, pitch_deck.filename), pitch_deck)
+
+    names, pitch_decks, already_stored = [], [], []
+    for result in results:
+        filename = secure_filename(os.path.basename(result['name']))
+        if (result['content_hash'], filename) in existing:
+            # Stored by an earlier run that stopped before writing its checkpoint
+            already_stored.append(result['name'])
+            continue
+        original = existing.get(result['content_hash'])
+        if original:
+            pitch_deck = original.clone(filename)
+        else:
+            pitch_deck = PitchDeck(filename, result['content'], len(result['segments']), result['analysis'],
+                                   content_hash=result['content_hash'],
+                                   segments=[DocumentSegment.from_segment(segment, result['kind'])
+                                             for segment in result['segments']])
+            existing[result['content_hash']] = pitch_deck
+        existing[(result['content_hash'], filename)] = pitch_deck
+        names.append(result['name'])
+        pitch_decks.append(pitch_deck)
+
+    saved, failed = PitchDeck.save_all(pitch_decks, redis_client) if pitch_decks else ([], [])
+    errors = {id(pitch_deck): error for pitch_deck, error in failed}
+    stored = already_stored + [name for name, pitch_deck in zip(names, pitch_decks) if id(pitch_deck) not in errors]
+    failures = [(name, str(errors[id(pitch_deck)])) for name, pitch_deck in zip(names, pitch_decks)
+                if id(pitch_deck) in errors]
+    # Keeps the session from holding every document of the run
+    db.session.expunge_all()
+    return stored, failures
+
+
+def ingest(source, redis_client, checkpoint_path, processes=None, batch_size=200, pptx_notes=True,
+           sentiment_cache_size=10000, pdf_backend='auto'):
+    processes = processes or os.cpu_count()
+    done = read_checkpoint(checkpoint_path)
+    total = count_sources(source)
+    if done:
+        logger.info(f"Resuming, {len(done)} files already ingested according to {checkpoint_path}")
+    # Loaded once here and shared copy-on-write with the forked pool processes
+    nlp.preload()
+
+    stats = {'stored': 0, 'failed': 0, 'skipped': 0}
+    spool_dir = tempfile.mkdtemp(prefix='documentreader-ingest-')
+    ctx = multiprocessing.get_context('fork')
+    executor = ProcessPoolExecutor(processes, mp_context=ctx, initializer=init_process,
+                                   initargs=(pptx_notes, sentiment_cache_size, pdf_backend))
+    pending = {}
+    results = []
+    start = time.perf_counter()
+
+    def flush():
+        stored, failures = store_batch(results, redis_client)
+        write_checkpoint(checkpoint_file, stored)
+        stats['stored'] += len(stored)
+        stats['failed'] += len(failures)
+        for name, error in failures:
+            logger.error(f"Failed to store {name}: {error}")
+        results.clear()
+        elapsed = time.perf_counter() - start
+        handled = stats['stored'] + stats['failed']
+        rate = handled / elapsed if elapsed else 0
+        remaining = f", about {(total - len(done) - handled) / rate:.0f}s left" if total and rate else ''
+        logger.info(f"{handled + len(done)}{f'/{total}' if total else ''} files, {stats['stored']} stored, "
+                    f"{stats['failed']} failed, {rate:.1f} files/s{remaining}")
+
+    def collect(futures):
+        nonlocal executor
+        for future in futures:
+            name, file_path, is_spooled, pool = pending.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                # A pool process died (e.g. OOM); the files it had are failed and a fresh pool takes the rest
+                result = {'name': name, 'error': f"BrokenProcessPool: {e}"}
+                if pool is executor:
+                    executor.shutdown(cancel_futures=True)
+                    executor = ProcessPoolExecutor(processes, mp_context=ctx, initializer=init_process,
+                                                   initargs=(pptx_notes, sentiment_cache_size, pdf_backend))
+            if is_spooled:
+                os.remove(file_path)
+            if 'error' in result:
+                stats['failed'] += 1
+                logger.error(f"Failed to ingest {name}: {result['error']}")
+                continue
+            results.append(result)
+            if len(results) >= batch_size:
+                flush()
+
+    try:
+        with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint_file:
+            for name, file_path, is_spooled in iter_sources(source, spool_dir):
+                if name in done:
+                    stats['skipped'] += 1
+                    if is_spooled:
+                        os.remove(file_path)
+                    continue
+                # A few files per process in flight, so archives are not unpacked far ahead of the parsing
+                while len(pending) >= processes * 4:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                pending[executor.submit(analyze_file, name, file_path)] = (name, file_path, is_spooled, executor)
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            if results:
+                flush()
+    finally:
+        executor.shutdown(cancel_futures=True)
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    stats['seconds'] = elapsed
+    logger.info(f"Ingested {stats['stored']} files in {elapsed:.1f}s "
+                f"({stats['stored'] / elapsed if elapsed else 0:.1f} files/s), {stats['failed']} failed, "
+                f"{stats['skipped']} skipped from an earlier run")
+    return stats
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Parse, analyze and store a directory or archive of documents")
+    arg_parser.add_argument('source', help="directory, .zip or tar archive of .pdf and .pptx files")
+    arg_parser.add_argument('--processes', type=int, default=0, help="parsing processes, 0 for one per CPU core")
+    arg_parser.add_argument('--batch-size', type=int, default=200, help="documents stored per commit")
+    arg_parser.add_argument('--checkpoint', help="file listing the ingested files, to resume an interrupted run "
+                                                 "(default: <source name>.ingest-checkpoint)")
+    args = arg_parser.parse_args(argv)
+    checkpoint_path = args.checkpoint or f"{os.path.basename(os.path.normpath(args.source))}.ingest-checkpoint"
+
+    load_dotenv()
+    app = Flask(__name__)
+    app.config.from_object(get_config())
+    connections.init_db(app)
+    redis_client = connections.redis_client(app.config)
+    nlp.require_resources()
+    with app.app_context():
+        missing = bootstrap.missing_tables()
+        if missing:
+            logger.error(f"Missing tables {', '.join(missing)}, run python -m app.bootstrap first")
+            return 1
+        stats = ingest(args.source, redis_client, checkpoint_path, args.processes, args.batch_size,
+                       pptx_notes=app.config['PPTX_INCLUDE_NOTES'],
+                       sentiment_cache_size=app.config['SENTIMENT_CACHE_SIZE'],
+                       pdf_backend=app.config['PDF_TEXT_BACKEND'])
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import json
+import threading
+import time
+
+# Jobs are split by upload size so a huge PDF never sits in front of a queue of short decks;
+# small jobs keep the original queue name
+SIZE_CLASSES = ('small', 'medium', 'large')
+QUEUES = {
+    'small': 'processing_queue',
+    'medium': 'processing_queue:medium',
+    'large': 'processing_queue:large'
+}
+LEASES = 'processing_leases'
+DEAD_LETTER_QUEUE = 'dead_letter_queue'
+# Redis can only block on one list when moving, so an idle worker re-checks the other queues this often
+IDLE_POLL_INTERVAL = 1
+
+# Moves one in-flight job back to its queue (or to the dead-letter list) unless it was acknowledged meanwhile
+REQUEUE_SCRIPT = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 1 then
+    redis.call('HDEL', KEYS[3], ARGV[1])
+    if ARGV[3] == '1' then
+        redis.call('LPUSH', KEYS[4], ARGV[2])
+    else
+        redis.call('RPUSH', KEYS[2], ARGV[2])
+    end
+    return 1
+end
+return 0
+"""
+
+# Pushes a lease back, unless the job was acknowledged or re-queued meanwhile
+RENEW_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# Starts the lease clock of a job found without one, unless it was acknowledged or re-queued meanwhile
+LEASE_SCRIPT = """
+if redis.call('LPOS', KEYS[1], ARGV[1]) then
+    return redis.call('HSETNX', KEYS[2], ARGV[1], ARGV[2])
+end
+return 0
+"""
+
+
+def size_class(size, medium_min_bytes, large_min_bytes):
+    if size >= large_min_bytes:
+        return 'large'
+    if size >= medium_min_bytes:
+        return 'medium'
+    return 'small'
+
+
+def enqueue(redis_client, job):
+    redis_client.lpush(QUEUES[job.get('size_class', 'small')], json.dumps(job))
+
+
+class JobQueue:
+    # Reliable mode moves each job atomically into a per-worker processing list and leases it;
+    # jobs that are not acknowledged before the lease expires are re-queued, up to max_attempts times.
+    # A running worker renews its leases (start_heartbeat) for up to max_lease_time seconds per job
+    def __init__(self, redis_client, worker_id, size_classes=SIZE_CLASSES, weights=None, reliable=True,
+                 visibility_timeout=600, max_attempts=3, max_lease_time=3600):
+        self.redis_client = redis_client
+        self.processing_list = f"processing:{worker_id}"
+        self.size_classes = [c for c in SIZE_CLASSES if c in size_classes]
+        if not self.size_classes:
+            raise ValueError(f"No known size class in {size_classes}")
+        self.weights = {c: (weights or {}).get(c, 1) for c in self.size_classes}
+        # Smooth weighted round robin: the class with the most credit plus weight is tried first
+        self.credits = {c: 0 for c in self.size_classes}
+        self.reliable = reliable
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.max_lease_time = max_lease_time
+        # Jobs this worker holds and when it took them, for the heartbeat
+        self.held = {}
+        self._requeue_script = redis_client.register_script(REQUEUE_SCRIPT)
+        self._renew_script = redis_client.register_script(RENEW_SCRIPT)
+        self._lease_script = redis_client.register_script(LEASE_SCRIPT)
+
+    def reserve(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            backlog = self._backlog()
+            for size_class in sorted(backlog, key=lambda c: -(self.credits[c] + self.weights[c])):
+                job_json = self._take(QUEUES[size_class])
+                if job_json:
+                    self._charge(size_class, backlog)
+                    return job_json
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            job_json = self._wait(min(remaining, IDLE_POLL_INTERVAL))
+            if job_json:
+                return job_json
+
+    def _take(self, queue):
+        if not self.reliable:
+            return self.redis_client.rpop(queue)
+        job_json = self.redis_client.lmove(queue, self.processing_list, 'RIGHT', 'LEFT')
+        if job_json:
+            self._lease(job_json)
+        return job_json
+
+    def _wait(self, timeout):
+        if not self.reliable:
+            job_data = self.redis_client.brpop([QUEUES[c] for c in self.size_classes], timeout=timeout)
+            if not job_data:
+                return None
+            size_class = next(c for c in self.size_classes if QUEUES[c] == job_data[0])
+            self._charge(size_class, [size_class])
+            return job_data[1]
+
+        # Block on the most heavily weighted queue; the others are picked up on the next pass
+        size_class = max(self.size_classes, key=lambda c: self.weights[c])
+        job_json = self.redis_client.blmove(QUEUES[size_class], self.processing_list, timeout, 'RIGHT', 'LEFT')
+        if job_json:
+            self._lease(job_json)
+            self._charge(size_class, [size_class])
+        return job_json
+
+    def _backlog(self):
+        pipe = self.redis_client.pipeline()
+        for c in self.size_classes:
+            pipe.llen(QUEUES[c])
+        return [c for c, depth in zip(self.size_classes, pipe.execute()) if depth]
+
+    def _charge(self, size_class, backlog):
+        # Only classes with a backlog take part in a round. An empty queue holds no credit while it waits,
+        # and the served class is not charged for it, so neither side drifts and starves the other later
+        for c in self.size_classes:
+            if c in backlog:
+                self.credits[c] += self.weights[c]
+            else:
+                self.credits[c] = 0
+        self.credits[size_class] -= sum(self.weights[c] for c in backlog)
+
+    def _lease(self, job_json):
+        self.held[job_json] = time.monotonic()
+        self.redis_client.hset(LEASES, job_json, time.time() + self.visibility_timeout)
+
+    def renew(self):
+        now = time.monotonic()
+        deadline = time.time() + self.visibility_timeout
+        renewed = 0
+        for job_json, taken in list(self.held.items()):
+            # A job held this long is left to expire, so one stuck worker cannot keep it forever
+            if now - taken < self.max_lease_time:
+                renewed += self._renew_script(keys=[LEASES], args=[job_json, deadline])
+        return renewed
+
+    def start_heartbeat(self, interval=None):
+        # Parsing blocks the worker's loop, so leases are renewed from a thread; set the returned event to stop it
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval or self.visibility_timeout / 3):
+                try:
+                    self.renew()
+                except Exception as e:
+                    print(f"Lease renewal error: {e}")
+
+        threading.Thread(target=beat, name='lease-heartbeat', daemon=True).start()
+        return stop
+
+    def ack(self, job_json):
+        self.held.pop(job_json, None)
+        if not self.reliable:
+            return
+        pipe = self.redis_client.pipeline()
+        pipe.lrem(self.processing_list, 1, job_json)
+        pipe.hdel(LEASES, job_json)
+        pipe.execute()
+
+    def fail(self, job_json):
+        self.held.pop(job_json, None)
+        if self.reliable:
+            return self._requeue(self.processing_list, job_json)
+
+    def _requeue(self, processing_list, job_json):
+        job = json.loads(job_json)
+        job['attempts'] = job.get('attempts', 0) + 1
+        dead = job['attempts'] >= self.max_attempts
+        queue = QUEUES[job.get('size_class', 'small')]
+        moved = self._requeue_script(keys=[processing_list, queue, LEASES, DEAD_LETTER_QUEUE],
+                                     args=[job_json, json.dumps(job), '1' if dead else '0'])
+        if not moved:
+            return None
+        return 'dead' if dead else 'requeued'
+
+    def reap(self):
+        # Any worker may run this; it also recovers jobs from processing lists of workers that died
+        now = time.time()
+        reaped = []
+        for processing_list in self.redis_client.scan_iter(match='processing:*', _type='list'):
+            for job_json in self.redis_client.lrange(processing_list, 0, -1):
+                deadline = self.redis_client.hget(LEASES, job_json)
+                if deadline is None:
+                    # Moved but not leased yet (or the lease was lost), start the clock now
+                    self._lease_script(keys=[processing_list, LEASES], args=[job_json, now + self.visibility_timeout])
+                elif float(deadline) < now:
+                    outcome = self._requeue(processing_list, job_json)
+                    if outcome:
+                        reaped.append((json.loads(job_json), outcome))
+        return reaped
@@ -0,0 +1,53 @@
+import json
+import time
+
+# Each job's progress is a Redis hash; every change is also published so clients can wait instead of polling
+STATES = ('queued', 'parsing', 'analyzing', 'stored', 'failed')
+FINAL_STATES = ('stored', 'failed')
+
+
+def job_key(job_id):
+    return f"job:{job_id}"
+
+
+def job_channel(job_id):
+    return f"job:{job_id}:events"
+
+
+def queue_state(pipe, job_id, state, ttl, **fields):
+    fields = {k: v for k, v in fields.items() if v is not None}
+    pipe.hset(job_key(job_id), mapping={'state': state, **fields})
+    # A re-queued job keeps its first queue time, so elapsed covers every attempt
+    (pipe.hsetnx if state == 'queued' else pipe.hset)(job_key(job_id), f"{state}_at", time.time())
+    pipe.expire(job_key(job_id), ttl)
+    pipe.publish(job_channel(job_id), json.dumps({'job_id': job_id, 'state': state, **fields}))
+
+
+def set_state(redis_client, job_id, state, ttl, **fields):
+    pipe = redis_client.pipeline()
+    queue_state(pipe, job_id, state, ttl, **fields)
+    pipe.execute()
+
+
+def decode_job(job_id, fields):
+    if not fields:
+        return None
+    job = {'job_id': job_id}
+    for key, value in fields.items():
+        if key.endswith('_at'):
+            job[key] = float(value)
+        elif key in ('document_id', 'attempts'):
+            job[key] = int(value)
+        else:
+            job[key] = value
+    if job['state'] in FINAL_STATES and 'queued_at' in job:
+        job['elapsed'] = round(job[f"{job['state']}_at"] - job['queued_at'], 3)
+    return job
+
+
+def get_job(redis_client, job_id):
+    return decode_job(job_id, redis_client.hgetall(job_key(job_id)))
+
+
+async def get_job_async(redis_client, job_id):
+    return decode_job(job_id, await redis_client.hgetall(job_key(job_id)))
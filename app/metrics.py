@@ -0,0 +1,174 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A minimal Prometheus text-format registry; every process (API or worker) exposes its own values
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{format_labels(self.label_names, key)} {value}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_value(self, key, counts):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{format_labels(self.label_names, key, [('le', bound)])} {cumulative}")
+        labels = format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {counts[-1]}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = {}
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collect(self, name, collector):
+        # collector() runs before every render to set gauges read from elsewhere; a later one of the same name
+        # replaces it, so a process that rebuilds its app reports the current one
+        self.collectors[name] = collector
+
+    def render(self):
+        for name, collector in list(self.collectors.items()):
+            try:
+                collector()
+            except Exception as e:
+                print(f"Metrics collector {name} failed: {e}")
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.add(Histogram(
+    'documentreader_stage_seconds', 'Time spent in each processing stage', ['stage']))
+JOB_SECONDS = REGISTRY.add(Histogram(
+    'documentreader_job_seconds', 'Time from taking a job off the queue until its document is stored'))
+JOB_WAIT_SECONDS = REGISTRY.add(Histogram(
+    'documentreader_job_wait_seconds', 'Time a job waited in the queue', ['size_class']))
+DOCUMENTS = REGISTRY.add(Counter('documentreader_documents_total', 'Documents stored', ['file_type']))
+PAGES = REGISTRY.add(Counter('documentreader_pages_total', 'Pages or slides of stored documents', ['file_type']))
+BYTES = REGISTRY.add(Counter('documentreader_bytes_total', 'Upload bytes of stored documents', ['file_type']))
+FAILURES = REGISTRY.add(Counter('documentreader_failures_total', 'Failed jobs by stage and error type',
+                                ['stage', 'error']))
+HTTP_REQUESTS = REGISTRY.add(Counter('documentreader_http_requests_total', 'HTTP requests served',
+                                     ['endpoint', 'status']))
+HTTP_SECONDS = REGISTRY.add(Histogram('documentreader_http_request_seconds', 'HTTP request latency',
+                                      ['endpoint']))
+QUEUE_DEPTH = REGISTRY.add(Gauge('documentreader_queue_depth', 'Jobs waiting per queue, read when scraped',
+                                 ['queue']))
+DB_POOL_CONNECTIONS = REGISTRY.add(Gauge('documentreader_db_pool_connections',
+                                         'Database connections of this process by state (in_use, idle)', ['state']))
+DB_POOL_MAX = REGISTRY.add(Gauge('documentreader_db_pool_max_connections',
+                                 'Database connections this process may open, pool size plus overflow'))
+REDIS_POOL_CONNECTIONS = REGISTRY.add(Gauge('documentreader_redis_pool_connections',
+                                            'Redis connections of this process by state (in_use, idle)', ['state']))
+REDIS_POOL_MAX = REGISTRY.add(Gauge('documentreader_redis_pool_max_connections',
+                                    'Redis connections this process may open'))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host='0.0.0.0'):
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
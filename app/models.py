@@ -1,88 +1,167 @@
-import pdfplumber
-import pptx
 import re
-from nltk.sentiment import SentimentIntensityAnalyzer
-from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk.corpus import stopwords
-from nltk.tag import pos_tag
-import nltk
+import zipfile
+import heapq
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from collections import Counter
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, UTC
+from app.sections import PITCH_DECK_PATTERN, SectionIndex
+from app.analysis import AnalysisContext, segment_text
+from app.sentiment import SentimentScorer
+from app import cache, nlp, slides, pdf_text
+from app.metrics import STAGE_SECONDS
+from app.utils import DocumentTooLarge, rss_mb
 
-nltk.download('punkt')
-nltk.download('punkt_tab')
-nltk.download('averaged_perceptron_tagger')
-nltk.download('averaged_perceptron_tagger_eng')
-nltk.download('stopwords')
-nltk.download('vader_lexicon')
 
 db = SQLAlchemy()
+# Bump when analyze_content changes; python -m app.reanalyze brings older documents up to date
+ANALYSIS_VERSION = 1
+
+
+def extract_pdf_page_range(file_path, start, stop, memory_budget_mb=0, backend='auto'):
+    # Runs in a pool process, so it opens its own handle on the PDF and checks its own memory
+    rss_limit = rss_mb() + memory_budget_mb if memory_budget_mb else None
+    texts = []
+    for text in pdf_text.get_backend(backend).iter_pages(file_path, range(start, stop)):
+        texts.append(text)
+        if rss_limit and rss_mb() > rss_limit:
+            raise DocumentTooLarge(f"PDF extraction used more than {memory_budget_mb} MB "
+                                   f"(stopped at page {start + len(texts)})")
+    return texts
 
 
 class PitchDeckParser:
-    def __init__(self, sia=None):
-        self.sia = sia if sia else SentimentIntensityAnalyzer()
-        self.stop_words = set(stopwords.words('english'))
+    pdf_pages_per_task = 8
+    pdf_pages_per_open = 25
+    pptx_slides_per_task = 16
 
-    def parse_pdf(self, file_path):
+    def __init__(self, sia=None, pdf_workers=1, pdf_parallel_min_pages=16, sentiment_cache_size=10000,
+                 pptx_workers=1, pptx_parallel_min_slides=48, pptx_notes=True, pdf_bounded_min_pages=100,
+                 pdf_memory_budget_mb=0, pdf_time_budget=0, pdf_backend='auto'):
+        self.sia = sia if sia else nlp.sentiment_analyzer()
+        self.sentiment = SentimentScorer(self.sia, cache_size=sentiment_cache_size)
+        self.stop_words = nlp.stop_words()
+        self.pdf_workers = pdf_workers
+        self.pdf_parallel_min_pages = pdf_parallel_min_pages
+        self.pdf_bounded_min_pages = pdf_bounded_min_pages
+        self.pdf_memory_budget_mb = pdf_memory_budget_mb
+        self.pdf_time_budget = pdf_time_budget
+        self.pdf_backend = pdf_text.get_backend(pdf_backend)
+        self.pptx_workers = pptx_workers
+        self.pptx_parallel_min_slides = pptx_parallel_min_slides
+        self.pptx_notes = pptx_notes
+        self._pool = None
+
+    def _get_pool(self):
+        # PDF pages and PPTX slides share one pool, sized for whichever format wants more processes
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=max(self.pdf_workers, self.pptx_workers),
+                                             mp_context=multiprocessing.get_context('fork'))
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def iter_pdf_pages(self, file_path, page_count):
+        starts = range(0, page_count, self.pdf_pages_per_task)
+        stops = [min(start + self.pdf_pages_per_task, page_count) for start in starts]
         try:
-            with pdfplumber.open(file_path) as pdf:
-                content = ""
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        page_text = re.sub(r'\s+', ' ', page_text.strip())
-                        content += page_text + "\n"
-                content = content.rstrip()
-                return content, len(pdf.pages)
+            # map() hands back each range in page order as soon as it and the ranges before it are done
+            for page_texts in self._get_pool().map(extract_pdf_page_range, [file_path] * len(starts), starts, stops,
+                                                   [self.pdf_memory_budget_mb] * len(starts),
+                                                   [self.pdf_backend.name] * len(starts)):
+                yield from page_texts
+        except BrokenProcessPool:
+            # A pool process died (e.g. OOM), start a fresh pool for the next document
+            self.close()
+            raise
+
+    def iter_bounded_pdf_pages(self, file_path, page_count):
+        # Reopens the PDF every pdf_pages_per_open pages, so the parsed object cache
+        # is dropped along the way instead of growing with the page count
+        for start in range(0, page_count, self.pdf_pages_per_open):
+            stop = min(start + self.pdf_pages_per_open, page_count)
+            yield from self.pdf_backend.iter_pages(file_path, range(start, stop))
+
+    def pdf_segments(self, file_path):
+        # One segment per page, numbered like the slides of a PPTX
+        started = time.monotonic()
+        rss_limit = rss_mb() + self.pdf_memory_budget_mb if self.pdf_memory_budget_mb else None
+        try:
+            page_count = self.pdf_backend.page_count(file_path)
+            if self.pdf_workers > 1 and page_count >= self.pdf_parallel_min_pages:
+                page_texts = self.iter_pdf_pages(file_path, page_count)
+            elif page_count < self.pdf_bounded_min_pages:
+                page_texts = self.pdf_backend.iter_pages(file_path, range(page_count))
+            else:
+                # Long documents are read a range of pages at a time
+                page_texts = self.iter_bounded_pdf_pages(file_path, page_count)
+            return self.page_segments(page_texts, started, rss_limit)
         except Exception as e:
             print(f"PDF parsing error: {e}")
             raise
 
-    def parse_pptx(self, file_path):
+    def page_segments(self, page_texts, started, rss_limit):
+        # Checks the job's time and memory budget after every page
+        segments = []
+        for number, page_text in enumerate(page_texts, 1):
+            if self.pdf_time_budget and time.monotonic() - started > self.pdf_time_budget:
+                raise DocumentTooLarge(f"PDF extraction took longer than {self.pdf_time_budget}s "
+                                       f"(stopped at page {number})")
+            if rss_limit and rss_mb() > rss_limit:
+                raise DocumentTooLarge(f"PDF extraction used more than {self.pdf_memory_budget_mb} MB "
+                                       f"(stopped at page {number})")
+            segments.append({'page': number, 'text': re.sub(r'\s+', ' ', page_text.strip()) if page_text else '',
+                             'notes': ''})
+        return segments
+
+    def parse_pdf(self, file_path):
+        segments = self.pdf_segments(file_path)
+        return "\n".join(segment['text'] for segment in segments if segment['text']).rstrip(), len(segments)
+
+    def pptx_segments(self, file_path):
+        # One segment per slide: its text from every shape, group and table, plus its speaker notes
         try:
-            prs = pptx.Presentation(file_path)
-            content = ""
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        content += shape.text + "\n"
-            return content, len(prs.slides)
+            with zipfile.ZipFile(file_path) as archive:
+                parts = slides.slide_parts(archive)
+            if self.pptx_workers > 1 and len(parts) >= self.pptx_parallel_min_slides:
+                step = self.pptx_slides_per_task
+                chunks = [parts[start:start + step] for start in range(0, len(parts), step)]
+                try:
+                    segments = []
+                    for chunk_segments in self._get_pool().map(
+                            slides.extract_slides, [file_path] * len(chunks), chunks,
+                            [self.pptx_notes] * len(chunks), range(1, len(parts) + 1, step)):
+                        segments.extend(chunk_segments)
+                    return segments
+                except BrokenProcessPool:
+                    self.close()
+                    raise
+            return slides.extract_slides(file_path, parts, self.pptx_notes)
         except Exception as e:
             print(f"PPTX parsing error: {e}")
             raise
 
-    def detect_document_type(self, text):
+    def parse_pptx(self, file_path):
+        segments = self.pptx_segments(file_path)
+        return slides.join_segments(segments), len(segments)
+
+    def detect_document_type(self, text, sections=None):
         text_lower = text.lower()
-        pitch_deck_patterns = [
-            r'our problem is\s+[^.\n]+',
-            r'our solution is\s+[^.\n]+',
-            r'the market is\s+[^.\n]+',
-            r'problem is\s+[^.\n]+',
-            r'solution is\s+[^.\n]+'
-        ]
-        for pattern in pitch_deck_patterns:
-            if re.search(pattern, text_lower):
-                print(f"Found pitch deck pattern: {pattern}")
-                return 'pitch_deck'
-
-        personal_sections = ['objective', 'summary', 'profile']
-        other_sections = ['experience', 'education', 'skills', 'certifications']
-        has_personal_section = False
-        has_other_section = False
-
-        for keyword in personal_sections:
-            if re.search(rf'(?i)\b{keyword}\b(?:\s*$|\s+.*$)', text_lower, re.MULTILINE):
-                print(f"Found personal section: {keyword}")
-                has_personal_section = True
-                break
-
-        for keyword in other_sections:
-            if re.search(rf'(?i)\b{keyword}(?:\s*(?:&.*)?(?:\s*$|\s+.*$))', text_lower, re.MULTILINE):
-                print(f"Found other section: {keyword}")
-                has_other_section = True
-                break
+        pitch_deck_match = PITCH_DECK_PATTERN.search(text_lower)
+        if pitch_deck_match:
+            print(f"Found pitch deck pattern: {pitch_deck_match.group(0)}")
+            return 'pitch_deck'
+
+        if sections is None:
+            sections = SectionIndex.from_text(text_lower)
+        has_personal_section = sections.has_personal_section
+        has_other_section = sections.has_other_section
 
         print(f"has_personal_section: {has_personal_section}, has_other_section: {has_other_section}")
         if has_personal_section and has_other_section:
@@ -91,115 +170,126 @@ class PitchDeckParser:
         return 'generic'
 
     def extract_section(self, lines, start_keyword, max_lines=10):
-        for i, line in enumerate(lines):
-            line_lower = line.lower().strip()
-            if re.search(rf'(?i)\b{start_keyword}(?:\s*(?:&.*)?(?:\s*:.*|\s+.*)?$)', line_lower):
-                section_lines = [line.strip()]
-                for j in range(1, max_lines + 1):
-                    if i + j < len(lines):
-                        next_line = lines[i + j].strip()
-                        next_line_lower = next_line.lower()
-                        if not next_line or next_line_lower.startswith(('objective', 'summary', 'profile', 'experience',
-                                                                        'skills', 'education', 'certifications')):
-                            break
-                        section_lines.append(next_line)
-                    else:
-                        break
-                return re.sub(r'\s+', ' ', ' '.join(section_lines))
-            if start_keyword == 'experience':
-                if re.search(
-                        r'(?i)[a-z\s&-]+(?:intern|engineer|developer|analyst|manager|specialist)(?:\s*:.*|\s+.*)?$',
-                        line_lower):
-                    section_lines = [line.strip()]
-                    for j in range(1, max_lines + 1):
-                        if i + j < len(lines):
-                            next_line = lines[i + j].strip()
-                            next_line_lower = next_line.lower()
-                            if not next_line or next_line_lower.startswith(('objective', 'summary', 'profile',
-                                                                            'experience', 'skills', 'education',
-                                                                            'certifications')):
-                                break
-                            section_lines.append(next_line)
-                        else:
-                            break
-                    return re.sub(r'\s+', ' ', ' '.join(section_lines))
-        return None
+        sections = lines if isinstance(lines, SectionIndex) else SectionIndex(lines)
+        return sections.section(start_keyword, max_lines)
+
+    def context(self, text):
+        return text if isinstance(text, AnalysisContext) else AnalysisContext(text, self.stop_words)
+
+    def analyze_segment(self, segment):
+        # Adds the intermediates stored with each page or slide: sentences, content words, their tags and sentiment
+        text = segment_text(segment)
+        context = AnalysisContext(text, self.stop_words)
+        sentences = context.sentences
+        with STAGE_SECONDS.time(stage='sentiment'):
+            valences = [self.sentiment.sentence_valence(sentence) for sentence in sentences]
+        segment['sentences'] = sentences
+        segment['tokens'] = context.words
+        segment['tags'] = [tag for _, tag in context.tagged_words]
+        segment['valence'] = float(sum(valences))
+        segment['sentiment_score'] = self.sentiment.combine(valences, text)
+        return segment
+
+    def segment_context(self, segments):
+        # Segments that come with their intermediates (e.g. loaded from the database) are not analyzed again
+        for segment in segments:
+            if segment.get('tags') is None:
+                self.analyze_segment(segment)
+        return AnalysisContext.from_segments(segments, self.stop_words)
 
     def extract_key_phrases(self, text, top_n=5):
-        words = word_tokenize(text.lower())
-        words = [word for word in words if word.isalnum() or '-' in word]
-        words = [word for word in words if word not in self.stop_words]
-        tagged_words = pos_tag(words)
-        phrases = []
-        current_phrase = []
+        context = self.context(text)
+        if top_n not in context.key_phrases:
+            tagged_words = context.tagged_words
+            with STAGE_SECONDS.time(stage='key_phrases'):
+                key_phrases = self._key_phrases(tagged_words, top_n)
+            context.key_phrases[top_n] = key_phrases if key_phrases else ["No key phrases identified"]
+        return list(context.key_phrases[top_n])
+
+    def _key_phrases(self, tagged_words, top_n):
+        phrase_counts = Counter()
         phrase_positions = {}
+        current_phrase = []
+        phrase_start = 0
+
+        def add_phrases():
+            for length in range(2, 4):
+                for start in range(len(current_phrase) - length + 1):
+                    phrase = ' '.join(current_phrase[start:start + length])
+                    phrase_counts[phrase] += 1
+                    phrase_positions.setdefault(phrase, phrase_start + start)
 
-        for word, tag in tagged_words:
+        for position, (word, tag) in enumerate(tagged_words):
             if tag.startswith(('NN', 'JJ')) or '-' in word:
+                if not current_phrase:
+                    phrase_start = position
                 current_phrase.append(word)
-            else:
-                if current_phrase:
-                    for length in range(2, 4):
-                        for start in range(len(current_phrase) - length + 1):
-                            if start + length <= len(current_phrase):
-                                phrase = ' '.join(current_phrase[start:start + length])
-                                if phrase not in phrase_positions:
-                                    phrase_positions[phrase] = words.index(current_phrase[start])
-                                phrases.append(phrase)
+            elif current_phrase:
+                add_phrases()
                 current_phrase = []
 
         if current_phrase:
-            for length in range(2, 4):
-                for start in range(len(current_phrase) - length + 1):
-                    if start + length <= len(current_phrase):
-                        phrase = ' '.join(current_phrase[start:start + length])
-                        if phrase not in phrase_positions:
-                            phrase_positions[phrase] = words.index(current_phrase[start])
-                        phrases.append(phrase)
-
-        phrase_counts = Counter(phrases)
-        sorted_phrases = sorted(
+            add_phrases()
+
+        top_phrases = heapq.nsmallest(
+            top_n,
             phrase_counts.items(),
-            key=lambda x: (-x[1], -len(x[0].split()), phrase_positions[x[0]])
+            key=lambda x: (-x[1], -x[0].count(' '), phrase_positions[x[0]])
         )
-        key_phrases = [phrase for phrase, count in sorted_phrases[:top_n] if len(phrase.split()) > 1]
-        return key_phrases if key_phrases else ["No key phrases identified"]
+        return [phrase for phrase, count in top_phrases]
 
     def extract_summary(self, text, max_sentences=3):
-        sentences = sent_tokenize(text.strip())
+        context = self.context(text)
+        if max_sentences not in context.summaries:
+            with STAGE_SECONDS.time(stage='summary'):
+                context.summaries[max_sentences] = self._summarize(context, max_sentences)
+        return context.summaries[max_sentences]
+
+    def _summarize(self, context, max_sentences):
+        sentences = context.sentences
         if not sentences:
             return "No content to summarize."
 
-        key_phrases = self.extract_key_phrases(text, top_n=5)
+        key_phrases = self.extract_key_phrases(context, top_n=5)
         if not key_phrases or key_phrases == ["No key phrases identified"]:
             return ' '.join(sentences[:max_sentences]).strip()
 
+        key_phrases = [phrase.lower() for phrase in key_phrases]
         sentence_scores = []
-        for sentence in sentences:
-            score = sum(1 for phrase in key_phrases if phrase.lower() in sentence.lower())
-            sentence_scores.append((sentence, score))
+        for position, sentence in enumerate(sentences):
+            sentence_lower = sentence.lower()
+            score = sum(1 for phrase in key_phrases if phrase in sentence_lower)
+            sentence_scores.append((sentence, score, position))
 
-        sentence_scores.sort(key=lambda x: (-x[1], sentences.index(x[0])))
-        top_sentences = [sentence for sentence, score in sentence_scores[:max_sentences]]
+        sentence_scores.sort(key=lambda x: (-x[1], x[2]))
+        top_sentences = [sentence for sentence, score, position in sentence_scores[:max_sentences]]
         return ' '.join(top_sentences).strip()
 
     def analyze_content(self, text):
+        context = self.context(text)
+        text = context.text
         info = {
             'upload_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             'word_count': len(text.split()),
             'char_count': len(text.replace('\n', ''))
         }
-        sentiment = self.sia.polarity_scores(text)
-        info['sentiment_score'] = sentiment['compound']
-        info['sentiment_type'] = 'Positive' if sentiment['compound'] > 0.05 else \
-            'Negative' if sentiment['compound'] < -0.05 else 'Neutral'
+        sentences = context.sentences
+        with STAGE_SECONDS.time(stage='sentiment'):
+            if context.valences is not None:
+                compound = self.sentiment.combine(context.valences, text)
+            else:
+                compound = self.sentiment.compound(text, sentences)
+        info['sentiment_score'] = compound
+        info['sentiment_type'] = 'Positive' if compound > 0.05 else \
+            'Negative' if compound < -0.05 else 'Neutral'
 
-        doc_type = self.detect_document_type(text.lower())
+        with STAGE_SECONDS.time(stage='detect_type'):
+            sections = context.sections
+            doc_type = self.detect_document_type(context.lower, sections)
         info['document_type'] = doc_type
-        lines = text.lower().split('\n')
 
         if doc_type == 'pitch_deck':
-            for line in lines:
+            for line in context.lines:
                 if 'problem' in line:
                     info['problem'] = line.strip()
                 elif 'solution' in line:
@@ -207,27 +297,40 @@ class PitchDeckParser:
                 elif 'market' in line:
                     info['market'] = line.strip()
         elif doc_type == 'resume':
-            info['problem'] = self.extract_section(lines, 'objective') or \
-                              self.extract_section(lines, 'summary') or \
-                              self.extract_section(lines, 'profile')
-            info['experience'] = self.extract_section(lines, 'experience')
-            info['skills'] = self.extract_section(lines, 'skills')
+            info['problem'] = sections.section('objective') or \
+                              sections.section('summary') or \
+                              sections.section('profile')
+            info['experience'] = sections.section('experience')
+            info['skills'] = sections.section('skills')
         else:
-            info['key_phrases'] = self.extract_key_phrases(text, top_n=5)
-            info['summary'] = self.extract_summary(text)
+            info['key_phrases'] = self.extract_key_phrases(context, top_n=5)
+            info['summary'] = self.extract_summary(context)
 
         if 'problem' not in info or not info['problem']:
-            info['problem'] = self.extract_summary(text)
+            info['problem'] = self.extract_summary(context)
 
         return info
 
 
+SEARCH_CONFIG = 'english'
+SEARCH_RANK_CANDIDATES = 1000
+# Only this much of the content is read for a snippet, so long documents do not slow every result page
+SEARCH_SNIPPET_SOURCE_CHARS = 20000
+SEARCH_MARK_START = '\x02'
+SEARCH_MARK_END = '\x03'
+SEARCH_HEADLINE_OPTIONS = (f"StartSel={SEARCH_MARK_START}, StopSel={SEARCH_MARK_END}, "
+                           "MaxFragments=2, MaxWords=25, MinWords=10, FragmentDelimiter=\" ... \"")
+
+
 class PitchDeck(db.Model):
     __tablename__ = 'pitch_decks'
+    # Keyset pagination of the dashboard walks this index newest first
+    __table_args__ = (db.Index('ix_pitch_decks_upload_date_id', 'upload_date', 'id'),)
 
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
-    upload_date = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+    # Naive UTC, like the column; asyncpg refuses an aware datetime for a timestamp without time zone
+    upload_date = db.Column(db.DateTime, default=lambda: datetime.now(UTC).replace(tzinfo=None))
     content = db.Column(db.Text)
     slide_count = db.Column(db.Integer)
     status = db.Column(db.String(50))
@@ -243,12 +346,27 @@ class PitchDeck(db.Model):
     skills = db.Column(db.Text)
     summary = db.Column(db.Text)
     key_phrases = db.Column(db.Text)
+    content_hash = db.Column(db.String(64), index=True)
+    analysis_version = db.Column(db.Integer)
+    segments = db.relationship('DocumentSegment', order_by='DocumentSegment.position',
+                               cascade='all, delete-orphan', passive_deletes=True)
 
-    def __init__(self, filename, content, slide_count, analysis, status='processed'):
+    def __init__(self, filename, content, slide_count, analysis, status='processed', content_hash=None,
+                 segments=None):
         self.filename = filename
+        self.content_hash = content_hash
         self.content = content
         self.slide_count = slide_count
         self.status = status
+        self.apply_analysis(analysis)
+        self.analysis_version = ANALYSIS_VERSION
+        if segments:
+            self.segments = segments
+        upload_date_str = analysis.get('upload_date')
+        if upload_date_str:
+            self.upload_date = datetime.strptime(upload_date_str, "%Y-%m-%d %H:%M:%S")
+
+    def apply_analysis(self, analysis):
         self.analysis = analysis
         self.word_count = analysis['word_count']
         self.char_count = analysis['char_count']
@@ -262,17 +380,246 @@ class PitchDeck(db.Model):
         self.skills = analysis.get('skills')
         self.summary = analysis.get('summary')
         self.key_phrases = ', '.join(analysis.get('key_phrases', [])) if analysis.get('key_phrases') else None
-        upload_date_str = analysis.get('upload_date')
-        if upload_date_str:
-            self.upload_date = datetime.strptime(upload_date_str, "%Y-%m-%d %H:%M:%S")
+
+    def to_summary(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'upload_date': self.upload_date.isoformat(),
+            'slide_count': self.slide_count,
+            'status': self.status,
+            'word_count': self.word_count,
+            'char_count': self.char_count,
+            'sentiment_score': self.sentiment_score,
+            'sentiment_type': self.sentiment_type,
+            'document_type': self.document_type,
+            'problem': self.problem,
+            'solution': self.solution,
+            'market': self.market,
+            'experience': self.experience,
+            'skills': self.skills,
+            'summary': self.summary,
+            'key_phrases': self.key_phrases
+        }
+
+    def to_dict(self):
+        data = self.to_summary()
+        data['content'] = self.content
+        return data
+
+    # The *_statement classmethods build the queries without running them, so the ASGI app's async session
+    # runs the same SQL as the Flask-SQLAlchemy one
+    @classmethod
+    def page_statement(cls, limit, before=None):
+        # Keyset pagination on (upload_date, id); the full text is left out of list views
+        statement = db.select(cls).options(db.defer(cls.content))
+        if before:
+            statement = statement.where(db.tuple_(cls.upload_date, cls.id) < before)
+        return statement.order_by(cls.upload_date.desc(), cls.id.desc()).limit(limit)
+
+    @classmethod
+    def summaries_statement(cls, ids):
+        return db.select(cls).options(db.defer(cls.content)).where(cls.id.in_(ids))
+
+    @classmethod
+    def page(cls, limit, before=None):
+        return db.session.scalars(cls.page_statement(limit, before)).all()
+
+    @classmethod
+    def newest_summaries(cls, limit):
+        return [pitch_deck.to_summary() for pitch_deck in cls.page(limit)]
+
+    @classmethod
+    def warm_cache(cls, redis_client):
+        return cache.warm(redis_client, cls.newest_summaries(cache.cache_size()))
+
+    @classmethod
+    def dashboard_page(cls, redis_client, limit, before=None):
+        if not redis_client.exists(cache.DASHBOARD_WARM):
+            cls.warm_cache(redis_client)
+        cached = cache.read_page(redis_client, limit, before)
+        if cached is None:
+            return [pitch_deck.to_summary() for pitch_deck in cls.page(limit, before)]
+
+        missing = cache.missing_documents(cached)
+        summaries = []
+        if missing:
+            summaries = [pitch_deck.to_summary() for pitch_deck in db.session.scalars(cls.summaries_statement(missing))]
+            cache.repair(redis_client, missing, summaries)
+        return cache.merge_page(cached, summaries)
+
+    @classmethod
+    def search_statement(cls, query, limit=20, offset=0, document_type=None, sentiment_type=None,
+                         candidates=SEARCH_RANK_CANDIDATES):
+        # Matches come from the GIN-indexed search_vector (PostgreSQL only, see SCHEMA_UPGRADES). Ranking reads
+        # every candidate's vector, so only the newest `candidates` matches are ranked: a term found in most
+        # documents then costs a short walk of the upload_date index instead of ranking all of them.
+        # Snippets are only built for the returned page, with SEARCH_MARK_* around the matches.
+        tsquery = db.func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        vector = db.literal_column('pitch_decks.search_vector')
+        newest = db.select(cls.id, vector.label('search_vector')).where(vector.op('@@')(tsquery))
+        if document_type:
+            newest = newest.where(cls.document_type == document_type)
+        if sentiment_type:
+            newest = newest.where(cls.sentiment_type == sentiment_type)
+        newest = newest.order_by(cls.upload_date.desc(), cls.id.desc()).limit(candidates).subquery()
+        rank = db.func.ts_rank_cd(newest.c.search_vector, tsquery, 32).label('rank')
+        matches = db.select(newest.c.id, rank).order_by(rank.desc(), newest.c.id.desc()) \
+            .limit(limit).offset(offset).subquery()
+
+        snippet = db.func.ts_headline(SEARCH_CONFIG, db.func.left(cls.content, SEARCH_SNIPPET_SOURCE_CHARS), tsquery,
+                                      SEARCH_HEADLINE_OPTIONS)
+        return db.select(cls, matches.c.rank, snippet) \
+            .join(matches, cls.id == matches.c.id) \
+            .options(db.defer(cls.content)) \
+            .order_by(matches.c.rank.desc(), cls.id.desc())
+
+    @classmethod
+    def search(cls, query, limit=20, offset=0, document_type=None, sentiment_type=None,
+               candidates=SEARCH_RANK_CANDIDATES):
+        rows = db.session.execute(cls.search_statement(query, limit, offset, document_type, sentiment_type,
+                                                       candidates)).all()
+        return [(pitch_deck, rank, snippet) for pitch_deck, rank, snippet in rows]
+
+    @classmethod
+    def too_large(cls, filename, reason, content_hash=None):
+        # A record of a document that went over its extraction budget, with the reason as its summary
+        analysis = {'word_count': 0, 'char_count': 0, 'sentiment_score': 0.0, 'sentiment_type': None,
+                    'summary': reason}
+        return cls(filename, '', 0, analysis, status='too_large', content_hash=content_hash)
+
+    @classmethod
+    def find_by_hash_statement(cls, content_hash):
+        # The segments come along, since the match is only looked up to be cloned
+        return db.select(cls).filter_by(content_hash=content_hash, status='processed') \
+            .options(db.selectinload(cls.segments)).order_by(cls.id).limit(1)
+
+    @classmethod
+    def find_by_hash(cls, content_hash):
+        return db.session.scalars(cls.find_by_hash_statement(content_hash)).first()
+
+    def clone(self, filename):
+        analysis = {
+            'word_count': self.word_count,
+            'char_count': self.char_count,
+            'sentiment_score': self.sentiment_score,
+            'sentiment_type': self.sentiment_type,
+            'document_type': self.document_type,
+            'problem': self.problem,
+            'solution': self.solution,
+            'market': self.market,
+            'experience': self.experience,
+            'skills': self.skills,
+            'summary': self.summary,
+            'key_phrases': self.key_phrases.split(', ') if self.key_phrases else None
+        }
+        pitch_deck = PitchDeck(filename, self.content, self.slide_count, analysis, status=self.status,
+                               content_hash=self.content_hash,
+                               segments=[segment.copy() for segment in self.segments])
+        pitch_deck.analysis_version = self.analysis_version
+        return pitch_deck
 
     def save(self, redis_client):
         try:
             db.session.add(self)
             db.session.commit()
-            redis_client.delete('dashboard_data')
+            cache.write_documents(redis_client, [self.to_summary()])
             return self.id
         except Exception as e:
             db.session.rollback()
             print(f"Database storage error: {e}")
             raise
+
+    @classmethod
+    def save_all(cls, pitch_decks, redis_client):
+        # One commit for the whole group; SQLAlchemy batches the INSERTs into multi-row statements
+        try:
+            db.session.add_all(pitch_decks)
+            db.session.commit()
+            saved, failed = list(pitch_decks), []
+        except Exception as e:
+            db.session.rollback()
+            print(f"Group storage error, storing rows one by one: {e}")
+            saved, failed = [], []
+            for pitch_deck in pitch_decks:
+                try:
+                    db.session.add(pitch_deck)
+                    db.session.commit()
+                    saved.append(pitch_deck)
+                except Exception as row_error:
+                    db.session.rollback()
+                    failed.append((pitch_deck, row_error))
+
+        if saved:
+            cache.write_documents(redis_client, [pitch_deck.to_summary() for pitch_deck in saved])
+        return saved, failed
+
+    def delete(self, redis_client):
+        try:
+            db.session.delete(self)
+            db.session.commit()
+            cache.remove_document(redis_client, self.id)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Database delete error: {e}")
+            raise
+
+
+class DocumentSegment(db.Model):
+    # One page or slide of a document, with the intermediates its analysis was built from
+    __tablename__ = 'document_segments'
+    __table_args__ = (db.UniqueConstraint('document_id', 'position'),)
+    INTERMEDIATES = ('sentences', 'tokens', 'tags', 'valence', 'sentiment_score')
+
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('pitch_decks.id', ondelete='CASCADE'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # page, slide, or document for one stored before segments
+    text = db.Column(db.Text)
+    notes = db.Column(db.Text)
+    sentences = db.Column(db.JSON)
+    tokens = db.Column(db.JSON)
+    tags = db.Column(db.JSON)
+    valence = db.Column(db.Float)
+    sentiment_score = db.Column(db.Float)
+
+    @classmethod
+    def from_segment(cls, segment, kind):
+        return cls(position=segment[kind], kind=kind, text=segment['text'], notes=segment.get('notes') or None,
+                   **{name: segment.get(name) for name in cls.INTERMEDIATES})
+
+    def to_segment(self):
+        segment = {self.kind: self.position, 'text': self.text or '', 'notes': self.notes or ''}
+        segment.update({name: getattr(self, name) for name in self.INTERMEDIATES})
+        return segment
+
+    def update_intermediates(self, segment):
+        for name in self.INTERMEDIATES:
+            setattr(self, name, segment[name])
+
+    def copy(self):
+        return DocumentSegment.from_segment(self.to_segment(), self.kind)
+
+
+# db.create_all() only creates missing tables, so columns added to existing tables are applied here
+SCHEMA_UPGRADES = [
+    "ALTER TABLE pitch_decks ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_pitch_decks_content_hash ON pitch_decks (content_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_pitch_decks_upload_date_id ON pitch_decks (upload_date, id)",
+    "ALTER TABLE pitch_decks ADD COLUMN IF NOT EXISTS analysis_version INTEGER",
+    # Generated, so every insert and update keeps it current; to_tsvector fails past 1MB of lexemes,
+    # hence the cap on the content
+    "ALTER TABLE pitch_decks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(filename, '') || ' ' || coalesce(key_phrases, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(skills, '') || ' ' || coalesce(summary, '')), 'B') || "
+    "setweight(to_tsvector('english', left(coalesce(content, ''), 500000)), 'C')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_pitch_decks_search_vector ON pitch_decks USING GIN (search_vector)",
+]
+
+
+def upgrade_schema():
+    if db.engine.dialect.name != 'postgresql':
+        return
+    with db.engine.begin() as conn:
+        for statement in SCHEMA_UPGRADES:
+            conn.execute(db.text(statement))
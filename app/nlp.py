@@ -0,0 +1,78 @@
+import functools
+import time
+
+# NLTK is imported and its data loaded on first use only: importing nltk alone takes a quarter of a second
+# and the API process never analyzes text. Data comes from the image's NLTK_DATA, nothing is downloaded.
+RESOURCES = {
+    'punkt_tab': 'tokenizers/punkt_tab/english/',
+    'averaged_perceptron_tagger_eng': 'taggers/averaged_perceptron_tagger_eng/',
+    'stopwords': 'corpora/stopwords',
+    'vader_lexicon': 'sentiment/vader_lexicon.zip'
+}
+
+
+def missing_resources():
+    import nltk
+    missing = []
+    for name, path in RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            missing.append(name)
+    return missing
+
+
+def require_resources():
+    missing = missing_resources()
+    if missing:
+        raise LookupError(f"Missing NLTK data: {', '.join(missing)}. "
+                          f"Install it with: python -m nltk.downloader {' '.join(missing)}")
+
+
+@functools.cache
+def stop_words():
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('english'))
+
+
+@functools.cache
+def tagger():
+    from nltk.tag.perceptron import PerceptronTagger
+    return PerceptronTagger()
+
+
+@functools.cache
+def sentiment_analyzer():
+    from nltk.sentiment import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
+
+
+def sent_tokenize(text):
+    from nltk.tokenize import sent_tokenize
+    return sent_tokenize(text)
+
+
+def word_tokenize(text):
+    from nltk.tokenize import word_tokenize
+    return word_tokenize(text)
+
+
+def pos_tag(words):
+    # nltk.pos_tag builds a new PerceptronTagger, reloading its model, on every call
+    return tagger().tag(words)
+
+
+def senti_text(text, constants):
+    from nltk.sentiment.vader import SentiText
+    return SentiText(text, constants.PUNC_LIST, constants.REGEX_REMOVE_PUNCTUATION)
+
+
+def preload():
+    # Called before forking workers so they share the loaded data copy-on-write; returns seconds per resource
+    timings = {}
+    for name, load in (('stopwords', stop_words), ('tagger', tagger), ('vader_lexicon', sentiment_analyzer),
+                       ('punkt_tab', lambda: sent_tokenize('Warm up.'))):
+        start = time.perf_counter()
+        load()
+        timings[name] = time.perf_counter() - start
+    return timings
@@ -0,0 +1,130 @@
+import gc
+import unicodedata
+import pdfplumber
+import pypdf
+
+# PDF text extraction backends. Each one counts a document's pages and yields the text of the pages at the given
+# indexes, in order (None for a page that cannot hold text); register another in BACKENDS to make it selectable
+MIN_PAGE_CHARS = 20
+MAX_GARBAGE_RATIO = 0.05
+MAX_SINGLE_LETTER_RATIO = 0.3
+MAX_WORD_LENGTH = 30
+MAX_RUN_TOGETHER_RATIO = 0.3
+MAX_FORM_DEPTH = 8
+# Control characters, private-use glyphs, unassigned code points and lone surrogates
+GARBAGE_CATEGORIES = ('Cc', 'Co', 'Cn', 'Cs')
+
+
+class PdfplumberBackend:
+    # Character-level layout analysis: slow, but the reference output the fast backend is checked against
+    name = 'pdfplumber'
+
+    def page_count(self, file_path):
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+
+    def iter_pages(self, file_path, indexes):
+        with pdfplumber.open(file_path, pages=[index + 1 for index in indexes]) as pdf:
+            for page in pdf.pages:
+                text = page.extract_text()
+                # Drops the page's parsed layout objects now instead of when the whole document is closed
+                page.close()
+                yield text
+        # pdfminer keeps every object it parsed, scanned page images included, until the document goes;
+        # the document and its pages reference each other, so only the cycle collector frees them
+        gc.collect()
+
+
+class PypdfBackend:
+    # Text operators read straight from the content streams, without placing every character
+    name = 'pypdf'
+
+    # Given a path, pypdf reads the whole file into memory; given an open file it reads objects as they are needed
+    def page_count(self, file_path):
+        with open(file_path, 'rb') as f:
+            return len(pypdf.PdfReader(f).pages)
+
+    def iter_pages(self, file_path, indexes):
+        with open(file_path, 'rb') as f:
+            reader = pypdf.PdfReader(f)
+            for index in indexes:
+                page = reader.pages[index]
+                # A scanned page has no fonts, so there is no text for any backend to find
+                yield page.extract_text() if has_fonts(page.get('/Resources')) else None
+        # The reader keeps every object it resolved, image streams included, and its pages refer back to it
+        gc.collect()
+
+
+class FallbackBackend:
+    # The fast backend's text for every page that passes looks_wrong, the careful backend's for the rest
+    name = 'auto'
+
+    def __init__(self, fast, careful):
+        self.fast = fast
+        self.careful = careful
+
+    def page_count(self, file_path):
+        try:
+            return self.fast.page_count(file_path)
+        except Exception:
+            return self.careful.page_count(file_path)
+
+    def iter_pages(self, file_path, indexes):
+        indexes = list(indexes)
+        try:
+            texts = list(self.fast.iter_pages(file_path, indexes))
+        except Exception as e:
+            # pypdf gives up on some malformed files that pdfminer reads
+            print(f"{self.fast.name} could not read {file_path}, using {self.careful.name}: {e}")
+            texts = [''] * len(indexes)
+        retry = [position for position, text in enumerate(texts) if text is not None and looks_wrong(text)]
+        if retry:
+            careful_texts = self.careful.iter_pages(file_path, [indexes[position] for position in retry])
+            for position, text in zip(retry, careful_texts):
+                texts[position] = text
+        yield from texts
+
+
+def has_fonts(resources, depth=0):
+    # Text can only come from the page's fonts or those of the form XObjects it draws
+    resources = resources.get_object() if resources is not None else None
+    if not resources or depth > MAX_FORM_DEPTH:
+        return False
+    if '/Font' in resources:
+        return True
+    xobjects = resources.get('/XObject')
+    for xobject in (xobjects.get_object().values() if xobjects is not None else ()):
+        xobject = xobject.get_object()
+        if xobject.get('/Subtype') == '/Form' and has_fonts(xobject.get('/Resources'), depth + 1):
+            return True
+    return False
+
+
+def looks_wrong(text):
+    # Too little text, undecodable glyphs, letters spaced apart or words run together
+    chars = ''.join(text.split()) if text else ''
+    if len(chars) < MIN_PAGE_CHARS:
+        return True
+    garbage = sum(1 for char in chars if char == '\ufffd' or unicodedata.category(char) in GARBAGE_CATEGORIES)
+    if garbage / len(chars) > MAX_GARBAGE_RATIO:
+        return True
+    words = text.split()
+    single_letters = sum(1 for word in words if len(word) == 1 and word.isalpha())
+    if single_letters / len(words) > MAX_SINGLE_LETTER_RATIO:
+        return True
+    run_together = sum(len(word) for word in words if len(word) > MAX_WORD_LENGTH)
+    return run_together / len(chars) > MAX_RUN_TOGETHER_RATIO
+
+
+BACKENDS = {
+    'pdfplumber': PdfplumberBackend(),
+    'pypdf': PypdfBackend()
+}
+BACKENDS['auto'] = FallbackBackend(BACKENDS['pypdf'], BACKENDS['pdfplumber'])
+
+
+def get_backend(name):
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown PDF text backend {name!r}, expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,44 @@
+import cProfile
+import heapq
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+
+
+class SlowJobProfiler:
+    # Profiles a sample of jobs and keeps the cProfile stats of the slowest `keep` on disk,
+    # deleting a kept file once a slower job pushes it out; inspect them with python -m pstats <file>
+    def __init__(self, directory, keep=5, sample_rate=1.0):
+        self.directory = directory
+        self.keep = keep
+        self.sample_rate = sample_rate
+        self.slowest = []
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def profile(self, name):
+        if random.random() >= self.sample_rate:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._record(name, time.perf_counter() - start, profiler)
+
+    def _record(self, name, seconds, profiler):
+        if len(self.slowest) >= self.keep and seconds <= self.slowest[0][0]:
+            return
+        safe_name = re.sub(r'[^\w.-]', '_', name)
+        path = os.path.join(self.directory, f"{seconds:010.3f}s-{os.getpid()}-{safe_name}.prof")
+        profiler.dump_stats(path)
+        heapq.heappush(self.slowest, (seconds, path))
+        if len(self.slowest) > self.keep:
+            _, faster_path = heapq.heappop(self.slowest)
+            os.remove(faster_path)
@@ -0,0 +1,120 @@
+import argparse
+import logging
+import sys
+import time
+from flask import Flask
+from dotenv import load_dotenv
+from app.models import PitchDeckParser, PitchDeck, DocumentSegment, ANALYSIS_VERSION, db
+from app.config import get_config
+from app import cache, connections, bootstrap
+
+# Re-runs analyze_content over the stored pages and slides, without the original files and without
+# tokenizing or tagging again: python -m app.reanalyze [--all] [--retokenize] [--batch-size N] [--shard i/n]
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def pending_documents(after_id, batch_size, reanalyze_all=False, shard=None):
+    query = PitchDeck.query.options(db.defer(PitchDeck.content), db.selectinload(PitchDeck.segments))
+    # Documents stored as too_large have nothing to analyze
+    query = query.filter(PitchDeck.id > after_id, PitchDeck.status == 'processed')
+    if not reanalyze_all:
+        query = query.filter(db.or_(PitchDeck.analysis_version.is_(None),
+                                    PitchDeck.analysis_version < ANALYSIS_VERSION))
+    if shard:
+        index, count = shard
+        query = query.filter(PitchDeck.id % count == index)
+    return query.order_by(PitchDeck.id).limit(batch_size).all()
+
+
+def reanalyze_document(parser, pitch_deck, retokenize=False):
+    rows = list(pitch_deck.segments)
+    if rows:
+        segments = [row.to_segment() for row in rows]
+        if retokenize:
+            for segment in segments:
+                segment['tags'] = None
+    else:
+        # Stored before segments existed: its full text becomes one segment, analyzed this once
+        segments = [{'document': 1, 'text': pitch_deck.content or '', 'notes': ''}]
+
+    context = parser.segment_context(segments)
+    pitch_deck.apply_analysis(parser.analyze_content(context))
+    pitch_deck.analysis_version = ANALYSIS_VERSION
+    if not rows:
+        pitch_deck.segments = [DocumentSegment.from_segment(segments[0], 'document')]
+    elif retokenize:
+        for row, segment in zip(rows, segments):
+            row.update_intermediates(segment)
+
+
+def reanalyze(parser, redis_client, batch_size=200, reanalyze_all=False, retokenize=False, shard=None):
+    # Keyset batches in id order, one commit each; a stopped run picks up where it left off
+    # since finished documents already have the current ANALYSIS_VERSION
+    done = 0
+    last_id = 0
+    start = time.perf_counter()
+    while True:
+        batch = pending_documents(last_id, batch_size, reanalyze_all, shard)
+        if not batch:
+            break
+        for pitch_deck in batch:
+            reanalyze_document(parser, pitch_deck, retokenize)
+        summaries = [pitch_deck.to_summary() for pitch_deck in batch]
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to store batch after document {last_id}: {e}")
+            raise
+        cache.refresh_documents(redis_client, summaries)
+        last_id = batch[-1].id
+        done += len(batch)
+        # Keeps the session from holding every document of the run
+        db.session.expunge_all()
+        elapsed = time.perf_counter() - start
+        logger.info(f"Re-analyzed {done} documents (up to id {last_id}), {done / elapsed:.1f} documents/s")
+    return done
+
+
+def parse_shard(value):
+    index, count = (int(part) for part in value.split('/'))
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError("shard must be i/n with 0 <= i < n")
+    return index, count
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Re-run document analysis over stored pages and slides")
+    arg_parser.add_argument('--all', action='store_true', dest='reanalyze_all',
+                            help=f"include documents already at analysis version {ANALYSIS_VERSION}")
+    arg_parser.add_argument('--retokenize', action='store_true',
+                            help="recompute the stored sentences, tokens, tags and sentiment as well")
+    arg_parser.add_argument('--batch-size', type=int, default=200)
+    arg_parser.add_argument('--shard', type=parse_shard, help="only ids with id %% n == i, to run n processes")
+    args = arg_parser.parse_args(argv)
+
+    load_dotenv()
+    app = Flask(__name__)
+    app.config.from_object(get_config())
+    connections.init_db(app)
+    redis_client = connections.redis_client(app.config)
+    parser = PitchDeckParser(sentiment_cache_size=app.config['SENTIMENT_CACHE_SIZE'])
+    with app.app_context():
+        missing = bootstrap.missing_tables()
+        if missing:
+            logger.error(f"Missing tables {', '.join(missing)}, run python -m app.bootstrap first")
+            return 1
+        count = reanalyze(parser, redis_client, args.batch_size, args.reanalyze_all, args.retokenize, args.shard)
+    logger.info(f"Done, re-analyzed {count} documents")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,79 +1,324 @@
 import os
-from flask import render_template, request, jsonify
+import html
 import json
+import time
+import uuid
+import redis
+from contextlib import contextmanager
+from flask import render_template, request, jsonify, Response, g
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 from datetime import datetime
-from app.models import PitchDeck
+from app.models import PitchDeck, db, SEARCH_MARK_START, SEARCH_MARK_END
+from app.utils import save_upload, UploadTooLarge, UploadTypeMismatch
+from app.job_queue import enqueue, size_class, QUEUES, DEAD_LETTER_QUEUE
+from app import metrics
+from app.job_status import queue_state, get_job, job_channel, FINAL_STATES
 
+# Queues whose depth /metrics reports
+METRIC_QUEUES = {**QUEUES, 'dead_letter': DEAD_LETTER_QUEUE}
+
+
+class ApiError(Exception):
+    # Raised by the request helpers below, which the Flask app here and the ASGI app in app.asgi share;
+    # both answer it as {'error': message} with its status
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+    def response(self):
+        return {'error': self.message}, self.status
+
+
+def init_routes(app, redis_client, pubsub_client):
+    @app.errorhandler(ApiError)
+    def api_error(e):
+        return e.response()
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        endpoint = request.endpoint or 'unknown'
+        metrics.HTTP_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        if 'request_start' in g:
+            metrics.HTTP_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        pipe = redis_client.pipeline()
+        queue_depths(pipe)
+        return Response(metrics_body(pipe.execute()), content_type=metrics.CONTENT_TYPE)
 
-def init_routes(app, redis_client, parser):
     @app.route('/')
     def dashboard():
+        before = dashboard_cursor(request.args)
         try:
-            cached_data = redis_client.get('dashboard_data')
-            if cached_data:
-                print("Serving dashboard from cache")
-                data = json.loads(cached_data)
-            else:
-                pitch_decks = PitchDeck.query.order_by(PitchDeck.upload_date.desc()).all()
-                data = [{
-                    'id': pd.id,
-                    'filename': pd.filename,
-                    'upload_date': pd.upload_date.isoformat(),
-                    'content': pd.content,
-                    'slide_count': pd.slide_count,
-                    'status': pd.status,
-                    'word_count': pd.word_count,
-                    'char_count': pd.char_count,
-                    'sentiment_score': pd.sentiment_score,
-                    'sentiment_type': pd.sentiment_type,
-                    'document_type': pd.document_type,
-                    'problem': pd.problem,
-                    'solution': pd.solution,
-                    'market': pd.market,
-                    'experience': pd.experience,
-                    'skills': pd.skills,
-                    'summary': pd.summary,
-                    'key_phrases': pd.key_phrases
-                } for pd in pitch_decks]
-                redis_client.setex('dashboard_data', 300, json.dumps(data))
-                print("Cached new dashboard data")
-            return render_template('dashboard.html', data=data)
+            page_size = app.config['DASHBOARD_PAGE_SIZE']
+            documents, next_cursor = split_page(PitchDeck.dashboard_page(redis_client, page_size + 1, before),
+                                                page_size)
+            return render_template('dashboard.html', data=documents, next_cursor=next_cursor)
         except Exception as e:
             print(f"Dashboard data fetch error: {e}")
             return jsonify({'error': 'Internal server error'}), 500
 
+    @app.route('/api/documents/<int:document_id>')
+    def document_detail(document_id):
+        pitch_deck = db.session.get(PitchDeck, document_id)
+        if pitch_deck is None:
+            return jsonify({'error': 'Document not found'}), 404
+        return jsonify(pitch_deck.to_dict())
+
+    @app.route('/api/search')
+    def search():
+        params = search_params(request.args, app.config, db.engine.dialect.name)
+        return jsonify(search_response(params, PitchDeck.search(**params)))
+
+    @app.route('/api/jobs/<job_id>')
+    def job_status(job_id):
+        job = get_job(redis_client, job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+
+    @app.route('/api/jobs/<job_id>/events')
+    def job_events(job_id):
+        pubsub = pubsub_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(job_channel(job_id))
+        except redis.ConnectionError as e:
+            pubsub.close()
+            print(f"Job event stream refused: {e}")
+            return jsonify({'error': 'Too many open event streams'}), 503
+        # Read after subscribing, so a change made in between is still delivered
+        job = get_job(redis_client, job_id)
+        if job is None:
+            pubsub.close()
+            return jsonify({'error': 'Job not found'}), 404
+
+        def events():
+            try:
+                state = job['state']
+                yield format_event(state, json.dumps(job))
+                while state not in FINAL_STATES:
+                    message = pubsub.get_message(timeout=app.config['JOB_EVENTS_KEEPALIVE'])
+                    state, event = job_event(message and message['data'], state)
+                    yield event
+            finally:
+                pubsub.close()
+
+        return Response(events(), mimetype='text/event-stream', headers=EVENT_STREAM_HEADERS)
+
     @app.route('/api/upload', methods=['POST'])
     def upload_file():
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
+        file, filename = form_file(request.files)
+        job_id, file_path = new_upload(app.config, filename)
+        with upload_errors():
+            content_hash, size, _ = save_upload(file.stream, file_path)
+            return queue_upload(job_id, filename, file_path, content_hash, size)
 
-        file = request.files['file']
-        if not file or file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+    @app.route('/api/upload/stream', methods=['POST'])
+    def upload_stream():
+        # The raw request body is the file, read in fixed-size chunks instead of being spooled by werkzeug
+        filename = stream_filename(request)
+        max_size = app.config['STREAM_MAX_CONTENT_LENGTH']
+        request.max_content_length = max_size
+        job_id, file_path = new_upload(app.config, filename)
+        with upload_errors(max_size):
+            # The first bytes are checked against the extension before anything is written
+            content_hash, size, _ = save_upload(request.stream, file_path, max_size=max_size,
+                                                file_type=file_extension(filename))
+            print(f"Received {size} bytes for {filename}")
+            return queue_upload(job_id, filename, file_path, content_hash, size)
 
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Unsupported file format'}), 400
+    def queue_upload(job_id, filename, file_path, content_hash, size):
+        existing = PitchDeck.find_by_hash(content_hash)
+        if existing:
+            duplicate = existing.clone(filename)
+            duplicate.save(redis_client)
+            os.remove(file_path)
+            return duplicate_response(existing, duplicate, filename)
 
-        try:
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
-            job = {
-                'filename': filename,
-                'file_path': file_path,
-                'timestamp': datetime.now().isoformat()
-            }
-            redis_client.lpush('processing_queue', json.dumps(job))
-            print(f"Queued file for processing: {filename}")
-            return jsonify({
-                'message': 'File queued for processing',
-                'filename': filename
-            }), 202
-        except Exception as e:
-            print(f"Upload error: {e}")
-            return jsonify({'error': str(e)}), 500
+        job = new_job(job_id, filename, file_path, content_hash, size, app.config)
+        pipe = redis_client.pipeline()
+        queue_job(pipe, job, app.config)
+        pipe.execute()
+        return queued_response(job)
+
+
+# Everything below is shared with the ASGI app: it takes what a request or Redis returned and gives back the
+# result, so the two servers only differ in how they wait for I/O
+
+def queue_depths(pipe):
+    for queue in METRIC_QUEUES.values():
+        pipe.llen(queue)
+
+
+def metrics_body(depths):
+    for name, depth in zip(METRIC_QUEUES, depths):
+        metrics.QUEUE_DEPTH.set(depth, queue=name)
+    return metrics.REGISTRY.render()
+
+
+def dashboard_cursor(args):
+    try:
+        return parse_cursor(args.get('before'))
+    except ValueError:
+        raise ApiError('Invalid cursor')
+
+
+def split_page(documents, page_size):
+    # A page is loaded with one extra row, which only tells whether another page follows
+    next_cursor = make_cursor(documents[page_size - 1]) if len(documents) > page_size else None
+    return documents[:page_size], next_cursor
+
+
+def search_params(args, config, dialect):
+    # The arguments of PitchDeck.search and PitchDeck.search_statement
+    query = args.get('q', '').strip()
+    if not query:
+        raise ApiError('No search query provided')
+    if dialect != 'postgresql':
+        raise ApiError('Search requires PostgreSQL', 501)
+    try:
+        limit = min(int(args.get('limit', 20)), config['SEARCH_MAX_RESULTS'])
+        offset = int(args.get('offset', 0))
+    except ValueError:
+        raise ApiError('Invalid limit or offset')
+    if limit < 1 or offset < 0:
+        raise ApiError('Invalid limit or offset')
+    return {'query': query, 'limit': limit, 'offset': offset, 'document_type': args.get('document_type'),
+            'sentiment_type': args.get('sentiment_type'), 'candidates': config['SEARCH_RANK_CANDIDATES']}
+
+
+def search_response(params, results):
+    return {
+        'query': params['query'],
+        'results': [dict(pitch_deck.to_summary(), rank=rank, snippet=highlight(snippet))
+                    for pitch_deck, rank, snippet in results],
+        'next_offset': params['offset'] + params['limit'] if len(results) == params['limit'] else None
+    }
+
+
+EVENT_STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def job_event(data, state):
+    # The event for a message from the job's channel, or a keepalive comment when none came in time
+    if data is None:
+        return state, ": keepalive\n\n"
+    state = json.loads(data)['state']
+    return state, format_event(state, data)
+
+
+def upload_filename(filename):
+    # Checked on the sanitized name, which may have lost its dot (".pdf" becomes "pdf")
+    filename = secure_filename(filename)
+    if not allowed_file(filename):
+        raise ApiError('Unsupported file format')
+    return filename
+
+
+def form_file(files):
+    if 'file' not in files:
+        raise ApiError('No file provided')
+    file = files['file']
+    if not file or file.filename == '':
+        raise ApiError('No file selected')
+    return file, upload_filename(file.filename)
+
+
+def stream_filename(request):
+    filename = request.headers.get('X-Filename') or request.args.get('filename')
+    if not filename:
+        raise ApiError('No filename provided')
+    return upload_filename(filename)
+
+
+def new_upload(config, filename):
+    job_id = uuid.uuid4().hex
+    return job_id, upload_path(config, job_id, filename)
+
+
+@contextmanager
+def upload_errors(max_size=None):
+    # Saving and queueing an upload: what its body can be refused for, and any other failure as a 500
+    try:
+        yield
+    except ApiError:
+        raise
+    except (UploadTooLarge, RequestEntityTooLarge):
+        raise ApiError(f'File exceeds the {max_size} byte limit', 413)
+    except UploadTypeMismatch:
+        raise ApiError('File content does not match its format')
+    except Exception as e:
+        print(f"Upload error: {e}")
+        raise ApiError(str(e), 500)
+
+
+def queue_job(pipe, job, config):
+    # The job's queued state and its queue entry go to Redis together
+    queue_state(pipe, job['job_id'], 'queued', config['JOB_STATUS_TTL'], filename=job['filename'])
+    enqueue(pipe, job)
+
+
+def queued_response(job):
+    print(f"Queued {job['size_class']} file for processing: {job['filename']}")
+    return {'message': 'File queued for processing', 'filename': job['filename'], 'job_id': job['job_id']}, 202
+
+
+def duplicate_response(existing, duplicate, filename):
+    print(f"Reused analysis of document {existing.id} for duplicate upload: {filename}")
+    return {'message': 'Duplicate file, reused existing analysis', 'filename': filename, 'id': duplicate.id}, 200
+
+
+def upload_path(config, job_id, filename):
+    # Prefixed with the job id, so two uploads with the same name never share (or delete) each other's file
+    return os.path.join(config['UPLOAD_FOLDER'], f"{job_id}_{filename}")
+
+
+def new_job(job_id, filename, file_path, content_hash, size, config):
+    return {
+        'job_id': job_id,
+        'filename': filename,
+        'file_path': file_path,
+        'content_hash': content_hash,
+        'size': size,
+        'file_type': file_extension(filename),
+        'size_class': size_class(size, config['QUEUE_MEDIUM_MIN_BYTES'], config['QUEUE_LARGE_MIN_BYTES']),
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+def file_extension(filename):
+    return os.path.splitext(filename)[1][1:].lower()
 
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'pdf', 'pptx'}
+    return file_extension(filename) in {'pdf', 'pptx'}
+
+
+def highlight(snippet):
+    # Document text is escaped; only the match markers become HTML
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(SEARCH_MARK_START, '<mark>').replace(SEARCH_MARK_END, '</mark>')
+
+
+def format_event(state, data):
+    return f"event: {state}\ndata: {data}\n\n"
+
+
+def make_cursor(summary):
+    return f"{summary['upload_date']}_{summary['id']}"
+
+
+def parse_cursor(cursor):
+    if not cursor:
+        return None
+    upload_date, _, document_id = cursor.rpartition('_')
+    return datetime.fromisoformat(upload_date), int(document_id)
@@ -0,0 +1,58 @@
+import re
+
+PERSONAL_SECTIONS = ('objective', 'summary', 'profile')
+OTHER_SECTIONS = ('experience', 'education', 'skills', 'certifications')
+SECTION_KEYWORDS = PERSONAL_SECTIONS + OTHER_SECTIONS
+
+PITCH_DECK_PATTERN = re.compile(r'(?:problem|solution) is\s+[^.\n]+|the market is\s+[^.\n]+')
+# One pass finds every section keyword in a line; the captured follower decides which checks it satisfies
+SECTION_KEYWORD_PATTERN = re.compile(rf'\b({"|".join(SECTION_KEYWORDS)})(?=([\s&:])|$)', re.IGNORECASE)
+JOB_TITLE_PATTERN = re.compile(r'[a-z\s&-](?:intern|engineer|developer|analyst|manager|specialist)(?=\s|:|$)',
+                               re.IGNORECASE)
+
+
+class SectionIndex:
+    def __init__(self, lines):
+        self.lines = [line.strip() for line in lines]
+        self.headers = {}
+        self.has_personal_section = False
+        self.has_other_section = False
+        self.first_job_title = None
+
+        count = len(self.lines)
+        # next_break[i] is the first line at or after i that ends a section (blank or another section heading)
+        self.next_break = [count] * (count + 1)
+        for i in range(count - 1, -1, -1):
+            line_lower = self.lines[i].lower()
+            if not line_lower or line_lower.startswith(SECTION_KEYWORDS):
+                self.next_break[i] = i
+            else:
+                self.next_break[i] = self.next_break[i + 1]
+
+            for match in SECTION_KEYWORD_PATTERN.finditer(line_lower):
+                keyword, follower = match.group(1).lower(), match.group(2)
+                self.headers[keyword] = i
+                if keyword in PERSONAL_SECTIONS:
+                    if follower is None or follower.isspace():
+                        self.has_personal_section = True
+                elif follower != ':':
+                    self.has_other_section = True
+
+            if JOB_TITLE_PATTERN.search(line_lower):
+                self.first_job_title = i
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(text.split('\n'))
+
+    def section(self, keyword, max_lines=10):
+        starts = [self.headers.get(keyword)]
+        if keyword == 'experience':
+            starts.append(self.first_job_title)
+        starts = [start for start in starts if start is not None]
+        if not starts:
+            return None
+
+        start = min(starts)
+        end = min(self.next_break[start + 1], start + 1 + max_lines)
+        return re.sub(r'\s+', ' ', ' '.join(self.lines[start:end]))
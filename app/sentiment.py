@@ -0,0 +1,87 @@
+import hashlib
+from collections import OrderedDict
+from app import nlp
+
+
+class SentimentScorer:
+    # VADER scored sentence by sentence; sentences repeat a lot across decks (footers, "Thank you"),
+    # so each sentence's raw valence is kept in a bounded LRU cache keyed by a hash of the normalized sentence
+    def __init__(self, sia=None, cache_size=10000):
+        self.sia = sia if sia else nlp.sentiment_analyzer()
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def sentence_key(sentence):
+        # VADER splits on whitespace, so collapsing it does not change the score
+        return hashlib.blake2b(' '.join(sentence.split()).encode('utf-8'), digest_size=16).digest()
+
+    def _valence(self, sentence):
+        # Same steps as SentimentIntensityAnalyzer.polarity_scores up to the summing of word valences. These are
+        # VADER internals, so nltk is pinned to an exact version in requirements.txt
+        constants = self.sia.constants
+        sentitext = nlp.senti_text(sentence, constants)
+        words_and_emoticons = sentitext.words_and_emoticons
+        first_index = {}
+        for i, item in enumerate(words_and_emoticons):
+            first_index.setdefault(item, i)
+
+        sentiments = []
+        for item in words_and_emoticons:
+            i = first_index[item]
+            if (i < len(words_and_emoticons) - 1 and item.lower() == "kind"
+                    and words_and_emoticons[i + 1].lower() == "of") or item.lower() in constants.BOOSTER_DICT:
+                sentiments.append(0)
+                continue
+            sentiments = self.sia.sentiment_valence(0, sentitext, item, i, sentiments)
+        sentiments = self.sia._but_check(words_and_emoticons, sentiments)
+        return float(sum(sentiments))
+
+    def sentence_valence(self, sentence):
+        return self._cached_valence(self.sentence_key(sentence), sentence)
+
+    def _cached_valence(self, key, sentence):
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        self.misses += 1
+        valence = self._valence(sentence)
+        self._cache[key] = valence
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return valence
+
+    def combine(self, valences, text):
+        sum_s = float(sum(valences))
+        # Punctuation emphasis applies once to the whole document, as polarity_scores does
+        punct_emph_amplifier = self.sia._punctuation_emphasis(sum_s, text)
+        if sum_s > 0:
+            sum_s += punct_emph_amplifier
+        elif sum_s < 0:
+            sum_s -= punct_emph_amplifier
+        return round(self.sia.constants.normalize(sum_s), 4)
+
+    def compound(self, text, sentences=None):
+        if sentences is None:
+            sentences = nlp.sent_tokenize(text.strip())
+        return self.combine([self.sentence_valence(sentence) for sentence in sentences], text)
+
+    def score_many(self, texts):
+        # Sentences shared by several documents in the batch are scored once, even if the LRU cache is smaller
+        batch = {}
+        scores = []
+        for text in texts:
+            valences = []
+            for sentence in nlp.sent_tokenize(text.strip()):
+                key = self.sentence_key(sentence)
+                if key in batch:
+                    self.hits += 1
+                else:
+                    batch[key] = self._cached_valence(key, sentence)
+                valences.append(batch[key])
+            scores.append(self.combine(valences, text))
+        return scores
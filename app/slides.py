@@ -0,0 +1,136 @@
+import posixpath
+import re
+import zipfile
+from lxml import etree
+
+# Reads slide text straight from the PPTX package instead of building python-pptx's object model
+NS = {
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+    'mc': 'http://schemas.openxmlformats.org/markup-compatibility/2006'
+}
+NOTES_SLIDE_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide'
+A = '{%s}' % NS['a']
+P = '{%s}' % NS['p']
+MC = '{%s}' % NS['mc']
+
+
+def relationships(archive, part):
+    folder, name = posixpath.split(part)
+    try:
+        root = etree.fromstring(archive.read(posixpath.join(folder, '_rels', name + '.rels')))
+    except KeyError:
+        return {}
+    return {rel.get('Id'): (rel.get('Type'), posixpath.normpath(posixpath.join(folder, rel.get('Target'))))
+            for rel in root.iterfind('rel:Relationship', NS) if rel.get('TargetMode') != 'External'}
+
+
+def slide_parts(archive):
+    # Slides in presentation order, with the part holding each slide's notes (None when it has none)
+    try:
+        presentation = etree.fromstring(archive.read('ppt/presentation.xml'))
+        targets = relationships(archive, 'ppt/presentation.xml')
+        parts = [targets[slide_id.get('{%s}id' % NS['r'])][1]
+                 for slide_id in presentation.iterfind('p:sldIdLst/p:sldId', NS)]
+    except KeyError:
+        # No usable slide list, fall back to the slide file numbering
+        names = [name for name in archive.namelist() if re.fullmatch(r'ppt/slides/slide\d+\.xml', name)]
+        parts = sorted(names, key=lambda name: int(re.search(r'\d+', posixpath.basename(name)).group()))
+    notes = []
+    for part in parts:
+        notes_parts = [target for kind, target in relationships(archive, part).values() if kind == NOTES_SLIDE_TYPE]
+        notes.append(notes_parts[0] if notes_parts else None)
+    return list(zip(parts, notes))
+
+
+def paragraph_text(paragraph):
+    pieces = []
+    for child in paragraph:
+        if child.tag in (A + 'r', A + 'fld'):
+            pieces.append(child.findtext(A + 't') or '')
+        elif child.tag == A + 'br':
+            pieces.append('\n')
+    return ''.join(pieces)
+
+
+def text_body(element):
+    body = element.find(P + 'txBody')
+    if body is None:
+        body = element.find(A + 'txBody')
+    if body is None:
+        return ''
+    return '\n'.join(paragraph_text(paragraph) for paragraph in body.iterfind(A + 'p')).strip()
+
+
+def table_text(table):
+    rows = []
+    for row in table.iterfind(A + 'tr'):
+        # Merged cells repeat as empty continuation cells
+        cells = [text_body(cell) for cell in row.iterfind(A + 'tc')
+                 if cell.get('hMerge') != '1' and cell.get('vMerge') != '1']
+        if any(cells):
+            rows.append('\t'.join(cells).rstrip('\t'))
+    return '\n'.join(rows)
+
+
+def shape_texts(tree):
+    # Text of every shape in z-order, descending into groups and table frames
+    for shape in tree:
+        if shape.tag == P + 'sp':
+            text = text_body(shape)
+            if text:
+                yield text
+        elif shape.tag == P + 'grpSp':
+            yield from shape_texts(shape)
+        elif shape.tag == P + 'graphicFrame':
+            for table in shape.iterfind('.//a:tbl', NS):
+                text = table_text(table)
+                if text:
+                    yield text
+        elif shape.tag == MC + 'AlternateContent':
+            # Shapes newer than the reader understands come with a fallback rendition
+            fallback = shape.find(MC + 'Fallback')
+            if fallback is not None:
+                yield from shape_texts(fallback)
+
+
+def slide_text(archive, part):
+    tree = etree.fromstring(archive.read(part)).find('p:cSld/p:spTree', NS)
+    return '\n'.join(shape_texts(tree)) if tree is not None else ''
+
+
+def notes_text(archive, part):
+    # Only the body placeholder holds the speaker's notes; the others are the slide image and number
+    tree = etree.fromstring(archive.read(part)).find('p:cSld/p:spTree', NS)
+    if tree is None:
+        return ''
+    texts = []
+    for shape in tree.iter(P + 'sp'):
+        placeholder = shape.find('p:nvSpPr/p:nvPr/p:ph', NS)
+        if placeholder is not None and placeholder.get('type') == 'body':
+            text = text_body(shape)
+            if text:
+                texts.append(text)
+    return '\n'.join(texts)
+
+
+def extract_slides(file_path, parts, include_notes=True, first_number=1):
+    # Runs in a pool process for big decks, so it opens its own handle on the file
+    segments = []
+    with zipfile.ZipFile(file_path) as archive:
+        for number, (part, notes_part) in enumerate(parts, first_number):
+            segments.append({
+                'slide': number,
+                'text': slide_text(archive, part),
+                'notes': notes_text(archive, notes_part) if include_notes and notes_part else ''
+            })
+    return segments
+
+
+def join_segments(segments):
+    texts = []
+    for segment in segments:
+        texts.extend(text for text in (segment['text'], segment['notes']) if text)
+    return '\n'.join(texts)
@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import os
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAGIC_BYTES = {
+    'pdf': b'%PDF-',
+    'pptx': b'PK\x03\x04',  # PPTX files are ZIP archives
+}
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadTypeMismatch(Exception):
+    pass
+
+
+class DocumentTooLarge(Exception):
+    pass
+
+
+class UploadWriter:
+    # Hash the bytes while they are written so duplicates can be found without reading the file again;
+    # only one chunk is held in memory, and a partial upload never replaces an existing file.
+    # With a file_type, content that does not start with its magic bytes is refused before anything is written
+    def __init__(self, file_path, max_size=None, file_type=None):
+        self.file_path = file_path
+        self.part_path = f"{file_path}.part"
+        self.max_size = max_size
+        self.file_type = file_type
+        self.content_hash = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+        self.file = None
+
+    def check(self, chunk):
+        # Counts and hashes a chunk before it is written; cheap enough for an event loop
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            raise UploadTooLarge(f"Upload exceeds {self.max_size} bytes")
+        if len(self.head) < 8:
+            self.head += chunk[:8 - len(self.head)]
+            if len(self.head) == 8:
+                self.check_type()
+        self.content_hash.update(chunk)
+
+    def check_type(self):
+        if self.file_type and sniff_file_type(self.head) != self.file_type:
+            raise UploadTypeMismatch(f"Upload is not a {self.file_type} file")
+
+    def write(self, chunk):
+        self.check(chunk)
+        self.flush(chunk)
+
+    def flush(self, data):
+        # Writes bytes that already went through check, opening the file on first use
+        if self.file is None:
+            self.file = open(self.part_path, 'wb')
+        self.file.write(data)
+
+    def finish(self, rest=b''):
+        if len(self.head) < 8:
+            self.check_type()
+        self.flush(rest)
+        self.file.close()
+        os.replace(self.part_path, self.file_path)
+        return self.content_hash.hexdigest(), self.size, self.head
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+def save_upload(stream, file_path, chunk_size=UPLOAD_CHUNK_SIZE, max_size=None, file_type=None):
+    writer = UploadWriter(file_path, max_size, file_type)
+    try:
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            writer.write(chunk)
+        return writer.finish()
+    except BaseException:
+        writer.discard()
+        raise
+
+
+async def save_upload_async(chunks, file_path, chunk_size=UPLOAD_CHUNK_SIZE, max_size=None, file_type=None):
+    # Same as save_upload for an async iterable of chunks. The file system calls run in a thread, so a slow disk
+    # does not hold up the other requests on the event loop; the (often small) chunks a server delivers are
+    # gathered up to chunk_size first, and a small upload is written and renamed in a single thread call.
+    writer = UploadWriter(file_path, max_size, file_type)
+    buffer = bytearray()
+    try:
+        async for chunk in chunks:
+            writer.check(chunk)
+            buffer += chunk
+            if len(buffer) >= chunk_size:
+                await asyncio.to_thread(writer.flush, bytes(buffer))
+                buffer.clear()
+        return await asyncio.to_thread(writer.finish, bytes(buffer))
+    except BaseException:
+        await asyncio.to_thread(writer.discard)
+        raise
+
+
+def hash_file(file_path, chunk_size=UPLOAD_CHUNK_SIZE):
+    # Same digest save_upload computes, for files that did not come through an upload
+    content_hash = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        head = f.read(8)
+        content_hash.update(head)
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest(), head
+
+
+def rss_mb():
+    # Resident set size of this process right now; ru_maxrss only ever reports the peak
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        return 0.0
+
+
+def sniff_file_type(head):
+    for file_type, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return file_type
+    return None
@@ -1,13 +1,24 @@
 import redis
 import json
 import os
+import gc
 import logging
 import signal
+import socket
 import sys
+import time
+import multiprocessing
+from contextlib import nullcontext
+from multiprocessing.connection import wait
 from datetime import datetime
 from flask import Flask
 from dotenv import load_dotenv
-from app.models import PitchDeckParser, PitchDeck, db
+from app.models import PitchDeckParser, PitchDeck, DocumentSegment, db
+from app.utils import DocumentTooLarge
+from app.job_queue import JobQueue
+from app.job_status import set_state
+from app import nlp, metrics, connections
+from app.profiling import SlowJobProfiler
 from app.config import get_config
 
 logging.basicConfig(
@@ -23,16 +34,11 @@ load_dotenv()
 
 app = Flask(__name__)
 app.config.from_object(get_config())
-db.init_app(app)
+connections.init_db(app)
 
 # Redis configuration
 try:
-    redis_client = redis.Redis(
-        host=app.config['REDIS_HOST'],
-        port=app.config['REDIS_PORT'],
-        db=app.config['REDIS_DB'],
-        decode_responses=True
-    )
+    redis_client = connections.redis_client(app.config)
     redis_client.ping()
     logger.info("Successfully connected to Redis")
 except redis.ConnectionError as e:
@@ -52,51 +58,259 @@ signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
 
-def process_queue():
-    parser = PitchDeckParser()
+def publish_state(job, state, **fields):
+    # Jobs queued before job ids existed have no state to update
+    if job.get('job_id'):
+        set_state(redis_client, job['job_id'], state, app.config['JOB_STATUS_TTL'], **fields)
+
+
+def process_job(parser, job):
+    file_path = job['file_path']
+    filename = job['filename']
+    content_hash = job.get('content_hash')
+
+    logger.info(f"Processing file: {filename}")
+    # The same content may have been processed while this job was waiting in the queue
+    existing = PitchDeck.find_by_hash(content_hash) if content_hash else None
+    if existing:
+        logger.info(f"Reusing analysis of document {existing.id}")
+        return existing.clone(filename)
+
+    publish_state(job, 'parsing')
+    if filename.endswith('.pdf'):
+        try:
+            with metrics.STAGE_SECONDS.time(stage='parse_pdf'):
+                segments, kind = parser.pdf_segments(file_path), 'page'
+        except DocumentTooLarge as e:
+            # Stored with its status instead of being retried, another attempt would go over the budget again
+            logger.error(f"{filename} is too large to process: {e}")
+            metrics.FAILURES.inc(stage='parse', error='DocumentTooLarge')
+            return PitchDeck.too_large(filename, str(e), content_hash=content_hash)
+    else:
+        with metrics.STAGE_SECONDS.time(stage='parse_pptx'):
+            segments, kind = parser.pptx_segments(file_path), 'slide'
+
+    logger.info("Analyzing content")
+    publish_state(job, 'analyzing')
+    # Each page or slide is tokenized and tagged on its own and stored with those results for re-analysis
+    context = parser.segment_context(segments)
+    analysis = parser.analyze_content(context)
+    logger.debug(f"Analysis results: {analysis}")
+    return PitchDeck(filename, context.text, len(segments), analysis, content_hash=content_hash,
+                     segments=[DocumentSegment.from_segment(segment, kind) for segment in segments])
+
+
+def remove_upload(file_path):
+    logger.info("Cleaning up temporary file")
+    if os.path.exists(file_path):
+        try:
+            os.remove(file_path)
+            logger.info(f"Deleted temporary file: {file_path}")
+        except OSError as e:
+            logger.error(f"Failed to delete temporary file {file_path}: {e}")
+    else:
+        logger.warning(f"Temporary file not found: {file_path}")
+
+
+def store_group(job_queue, group):
+    logger.info(f"Storing {len(group)} documents in database")
+    with metrics.STAGE_SECONDS.time(stage='save'):
+        saved, failed = PitchDeck.save_all([pitch_deck for _, _, pitch_deck, _ in group], redis_client)
+    errors = {id(pitch_deck): error for pitch_deck, error in failed}
+    for job_json, job, pitch_deck, start_time in group:
+        if id(pitch_deck) in errors:
+            logger.error(f"Failed to store {job['filename']}: {errors[id(pitch_deck)]}")
+            fail_job(job_queue, job_json, job, errors[id(pitch_deck)], 'save')
+            continue
+        job_queue.ack(job_json)
+        remove_upload(job['file_path'])
+        if pitch_deck.status != 'processed':
+            publish_state(job, 'failed', document_id=pitch_deck.id, error=pitch_deck.summary)
+            continue
+        publish_state(job, 'stored', document_id=pitch_deck.id)
+        processing_time = (datetime.now() - start_time).total_seconds()
+        file_type = job.get('file_type') or job['filename'].rsplit('.', 1)[-1].lower()
+        metrics.JOB_SECONDS.observe(processing_time)
+        metrics.DOCUMENTS.inc(file_type=file_type)
+        metrics.PAGES.inc(pitch_deck.slide_count or 0, file_type=file_type)
+        if 'size' in job:
+            metrics.BYTES.inc(job['size'], file_type=file_type)
+        logger.info(f"Processed file: {job['filename']} in {processing_time:.2f} seconds")
+
+
+def fail_job(job_queue, job_json, job, error, stage):
+    metrics.FAILURES.inc(stage=stage, error=type(error).__name__)
+    outcome = job_queue.fail(job_json)
+    if outcome == 'requeued':
+        logger.info(f"Re-queued {job['filename']} for another attempt")
+        publish_state(job, 'queued', attempts=job.get('attempts', 0) + 1, error=str(error))
+    elif outcome == 'dead':
+        logger.error(f"Giving up on {job['filename']}, moved to the dead-letter queue (file kept at {job['file_path']})")
+        publish_state(job, 'failed', error=str(error))
+    elif not job_queue.reliable:
+        publish_state(job, 'failed', error=str(error))
+
+
+def reap_jobs(job_queue):
+    for job, outcome in job_queue.reap():
+        if outcome == 'dead':
+            logger.error(f"Job for {job['filename']} timed out too often, moved to the dead-letter queue")
+            metrics.FAILURES.inc(stage='timeout', error='Timeout')
+            publish_state(job, 'failed', error='Timed out')
+        else:
+            logger.warning(f"Job for {job['filename']} was not acknowledged in time, re-queued")
+            metrics.FAILURES.inc(stage='timeout', error='Timeout')
+            publish_state(job, 'queued', attempts=job.get('attempts', 0) + 1, error='Timed out')
+
+
+def process_queue(index=0):
+    if app.config['WORKER_METRICS_PORT']:
+        port = app.config['WORKER_METRICS_PORT'] + index
+        metrics.start_http_server(port)
+        logger.info(f"Serving metrics on port {port}")
+    profiler = None
+    if app.config['PROFILE_SLOWEST_JOBS']:
+        profiler = SlowJobProfiler(app.config['PROFILE_DIR'], keep=app.config['PROFILE_SLOWEST_JOBS'],
+                                   sample_rate=app.config['PROFILE_SAMPLE_RATE'])
+    parser = PitchDeckParser(pdf_workers=app.config['PDF_PARSE_WORKERS'],
+                             pdf_parallel_min_pages=app.config['PDF_PARALLEL_MIN_PAGES'],
+                             pdf_bounded_min_pages=app.config['PDF_BOUNDED_MIN_PAGES'],
+                             pdf_memory_budget_mb=app.config['PDF_MEMORY_BUDGET_MB'],
+                             pdf_time_budget=app.config['PDF_TIME_BUDGET'],
+                             pdf_backend=app.config['PDF_TEXT_BACKEND'],
+                             pptx_workers=app.config['PPTX_PARSE_WORKERS'],
+                             pptx_parallel_min_slides=app.config['PPTX_PARALLEL_MIN_SLIDES'],
+                             pptx_notes=app.config['PPTX_INCLUDE_NOTES'],
+                             sentiment_cache_size=app.config['SENTIMENT_CACHE_SIZE'])
+    job_queue = JobQueue(redis_client, f"{socket.gethostname()}:{os.getpid()}",
+                         size_classes=app.config['WORKER_SIZE_CLASSES'],
+                         weights=app.config['QUEUE_WEIGHTS'],
+                         reliable=app.config['WORKER_RELIABLE_QUEUE'],
+                         visibility_timeout=app.config['JOB_VISIBILITY_TIMEOUT'],
+                         max_attempts=app.config['JOB_MAX_ATTEMPTS'],
+                         max_lease_time=app.config['JOB_LEASE_MAX_TIME'])
+    # Keeps the leases of the job being parsed and of the uncommitted group from expiring
+    heartbeat = job_queue.start_heartbeat() if job_queue.reliable else None
+    batch_size = app.config['WORKER_COMMIT_BATCH_SIZE']
+    window = app.config['WORKER_COMMIT_WINDOW_MS'] / 1000
+    # Finished analyses wait here so a whole group is written with one commit
+    group = []
+    group_deadline = 0
+    next_reap = 0
     with app.app_context():
         while keep_running:
             try:
-                logger.info("Waiting for job in processing queue")
-                job_data = redis_client.brpop('processing_queue', timeout=5)
-                if job_data and keep_running:
-                    _, job_json = job_data
-                    job = json.loads(job_json)
-                    file_path = job['file_path']
-                    filename = job['filename']
+                if job_queue.reliable and time.monotonic() >= next_reap:
+                    reap_jobs(job_queue)
+                    next_reap = time.monotonic() + app.config['JOB_REAPER_INTERVAL']
+
+                if group and (len(group) >= batch_size or time.monotonic() >= group_deadline):
+                    pending, group = group, []
+                    store_group(job_queue, pending)
 
-                    logger.info(f"Processing file: {filename}")
+                if group:
+                    timeout = max(group_deadline - time.monotonic(), 0.01)
+                else:
+                    logger.info(f"Waiting for {', '.join(job_queue.size_classes)} jobs")
+                    timeout = 5
+                job_json = job_queue.reserve(timeout)
+                # A taken job is finished even if a shutdown signal arrived meanwhile
+                if job_json:
+                    job = json.loads(job_json)
                     start_time = datetime.now()
-                    if filename.endswith('.pdf'):
-                        content, slide_count = parser.parse_pdf(file_path)
-                    else:
-                        content, slide_count = parser.parse_pptx(file_path)
-
-                    logger.info("Analyzing content")
-                    analysis = parser.analyze_content(content)
-                    logger.debug(f"Analysis results: {analysis}")
-
-                    logger.info("Storing data in database")
-                    pitch_deck = PitchDeck(filename, content, slide_count, analysis)
-                    pitch_deck.save(redis_client)
-
-                    logger.info("Cleaning up temporary file")
-                    if os.path.exists(file_path):
-                        try:
-                            os.remove(file_path)
-                            logger.info(f"Deleted temporary file: {file_path}")
-                        except OSError as e:
-                            logger.error(f"Failed to delete temporary file {file_path}: {e}")
-                    else:
-                        logger.warning(f"Temporary file not found: {file_path}")
-
-                    processing_time = (datetime.now() - start_time).total_seconds()
-                    logger.info(f"Processed file: {filename} in {processing_time:.2f} seconds")
+                    if 'timestamp' in job:
+                        metrics.JOB_WAIT_SECONDS.observe(
+                            (start_time - datetime.fromisoformat(job['timestamp'])).total_seconds(),
+                            size_class=job.get('size_class', 'small'))
+                    try:
+                        with profiler.profile(job['filename']) if profiler else nullcontext():
+                            pitch_deck = process_job(parser, job)
+                    except Exception as e:
+                        logger.error(f"Failed to process {job['filename']}: {e}")
+                        fail_job(job_queue, job_json, job, e, 'process')
+                        continue
+                    if not group:
+                        group_deadline = time.monotonic() + window
+                    group.append((job_json, job, pitch_deck, start_time))
+            except Exception as e:
+                logger.error(f"Queue processing error: {e}")
+
+        if group:
+            try:
+                store_group(job_queue, group)
             except Exception as e:
                 logger.error(f"Queue processing error: {e}")
+    if heartbeat:
+        heartbeat.set()
+    parser.close()
+
+
+def worker_process_main(index):
+    logger.info(f"Worker process {index} started with pid {os.getpid()}")
+    # Connections opened by the parent must not be shared with the forked child
+    with app.app_context():
+        db.engine.dispose(close=False)
+    process_queue(index)
+    logger.info(f"Worker process {index} stopped")
+
+
+def start_worker_process(ctx, index):
+    process = ctx.Process(target=worker_process_main, args=(index,), name=f"worker-{index}")
+    process.start()
+    return process
+
+
+def preload_nlp():
+    nlp.require_resources()
+    timings = nlp.preload()
+    logger.info("Loaded NLTK data: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+
+
+def run_pool(num_processes):
+    # fork keeps the NLTK data loaded here shared copy-on-write with the children;
+    # freezing moves it out of the collector's reach, so collections in the children do not touch those pages
+    gc.freeze()
+    ctx = multiprocessing.get_context('fork')
+    workers = {index: start_worker_process(ctx, index) for index in range(num_processes)}
+    logger.info(f"Started {num_processes} worker processes")
+    # Crashed workers waiting out their restart delay, by index; the others are still watched meanwhile
+    restart_at = {}
+
+    while keep_running:
+        now = time.monotonic()
+        timeout = min([1] + [max(at - now, 0) for at in restart_at.values()])
+        wait([process.sentinel for index, process in workers.items() if index not in restart_at], timeout=timeout)
+        if not keep_running:
+            break
+        for index, process in workers.items():
+            if index in restart_at:
+                if time.monotonic() >= restart_at[index]:
+                    del restart_at[index]
+                    workers[index] = start_worker_process(ctx, index)
+            elif not process.is_alive():
+                process.join()
+                logger.error(f"Worker process {index} (pid {process.pid}) exited with code {process.exitcode}, "
+                             f"restarting in {app.config['WORKER_RESTART_DELAY']} seconds")
+                restart_at[index] = time.monotonic() + app.config['WORKER_RESTART_DELAY']
+
+    logger.info("Stopping worker processes")
+    for process in workers.values():
+        if process.is_alive():
+            process.terminate()
+    for index, process in workers.items():
+        process.join(timeout=app.config['WORKER_SHUTDOWN_TIMEOUT'])
+        if process.is_alive():
+            logger.warning(f"Worker process {index} did not stop in time, killing it")
+            process.kill()
+            process.join()
 
 
 if __name__ == '__main__':
     logger.info("Starting queue processing")
-    process_queue()
+    preload_nlp()
+    num_processes = app.config['WORKER_PROCESSES'] or os.cpu_count()
+    if num_processes > 1:
+        run_pool(num_processes)
+    else:
+        process_queue()
     logger.info("Worker stopped")
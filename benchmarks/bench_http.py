@@ -0,0 +1,166 @@
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Load generator for a running API server, to compare the Flask server (python run.py) with the ASGI one
+# (python -m app.asgi): python -m benchmarks.bench_http http://localhost:5000 --concurrency 32 --seconds 20
+SCENARIOS = ('dashboard', 'job', 'upload')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+def upload_body(worker, count):
+    # A distinct file every time, so each upload is queued instead of being answered as a duplicate
+    return b'%PDF-1.4\n' + f"bench {worker} {count} {os.urandom(8).hex()}\n".encode()
+
+
+class Client:
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        # One keep-alive connection per client, reopened after an error
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.conn.request(method, path, body=body, headers=headers or {})
+            response = self.conn.getresponse()
+            data = response.read()
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+            return response.status, data
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def send(client, scenario, job_id, worker, count):
+    if scenario == 'dashboard':
+        return client.request('GET', '/')
+    if scenario == 'job':
+        return client.request('GET', f'/api/jobs/{job_id}')
+    return client.request('POST', '/api/upload/stream', body=upload_body(worker, count),
+                          headers={'X-Filename': f'bench-{worker}.pdf', 'Content-Type': 'application/pdf'})
+
+
+def hold_stream(base_url, job_id, deadline, opened, timeout):
+    # An open /events stream, as a browser waiting for a job would keep, until the run ends
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    try:
+        conn.request('GET', f'/api/jobs/{job_id}/events')
+        response = conn.getresponse()
+        if response.status == 200 and response.readline().startswith(b'event:'):
+            opened.append(True)
+            while time.perf_counter() < deadline:
+                time.sleep(0.1)
+    except (OSError, http.client.HTTPException):
+        pass
+    finally:
+        conn.close()
+
+
+def run(base_url, scenarios, concurrency, seconds, streams=0, timeout=30):
+    status, data = Client(base_url, timeout).request('POST', '/api/upload/stream', body=upload_body('setup', 0),
+                                                     headers={'X-Filename': 'bench-setup.pdf'})
+    if status != 202:
+        raise RuntimeError(f"setup upload returned {status}: {data[:200]!r}")
+    job_id = json.loads(data)['job_id']
+
+    results = {scenario: {'latencies': [], 'errors': 0} for scenario in scenarios}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        client = Client(base_url, timeout)
+        count = 0
+        latencies = {scenario: [] for scenario in scenarios}
+        errors = dict.fromkeys(scenarios, 0)
+        while time.perf_counter() < deadline:
+            # Every worker cycles through the scenarios, starting at a different one
+            scenario = scenarios[(index + count) % len(scenarios)]
+            start = time.perf_counter()
+            try:
+                status, _ = send(client, scenario, job_id, index, count)
+                ok = status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+            if ok:
+                latencies[scenario].append(time.perf_counter() - start)
+            else:
+                errors[scenario] += 1
+            count += 1
+        client.close()
+        with lock:
+            for scenario in scenarios:
+                results[scenario]['latencies'].extend(latencies[scenario])
+                results[scenario]['errors'] += errors[scenario]
+
+    opened = []
+    holders = [threading.Thread(target=hold_stream, args=(base_url, job_id, deadline, opened, timeout))
+               for _ in range(streams)]
+    for thread in holders:
+        thread.start()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    for thread in holders:
+        thread.join()
+
+    print(f"{base_url}: {concurrency} clients for {elapsed:.1f}s"
+          + (f", {len(opened)} of {streams} event streams held open" if streams else ''))
+    print(f"  {'scenario':<10} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    all_latencies = []
+    for scenario, result in results.items():
+        latencies = result['latencies']
+        all_latencies.extend(latencies)
+        print(f"  {scenario:<10} {len(latencies):9d} {len(latencies) / elapsed:8.1f} "
+              f"{percentile(latencies, 0.5) * 1000:8.1f} {percentile(latencies, 0.95) * 1000:8.1f} "
+              f"{percentile(latencies, 0.99) * 1000:8.1f} {result['errors']:7d}")
+    print(f"  {'total':<10} {len(all_latencies):9d} {len(all_latencies) / elapsed:8.1f} "
+          f"{percentile(all_latencies, 0.5) * 1000:8.1f} {percentile(all_latencies, 0.95) * 1000:8.1f} "
+          f"{percentile(all_latencies, 0.99) * 1000:8.1f} {sum(r['errors'] for r in results.values()):7d}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure throughput and latency of a running API server")
+    parser.add_argument('url', nargs='?', default='http://localhost:5000')
+    parser.add_argument('--concurrency', type=int, default=32, help="clients sending requests at the same time")
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--streams', type=int, default=0, help="job event streams kept open during the run")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help="comma-separated mix of dashboard, job (status poll) and upload (streamed PDF)")
+    args = parser.parse_args(argv)
+    scenarios = args.scenarios.split(',')
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    run(args.url.rstrip('/'), scenarios, args.concurrency, args.seconds, args.streams)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import random
+import sys
+import time
+from app.models import PitchDeckParser
+
+SIZES = [1_000, 10_000, 50_000, 100_000, 200_000]
+VOCABULARY = (
+    "market revenue growth customer platform data pipeline cloud product team strategy investor "
+    "real-time analytics mobile payments scalable infrastructure machine learning model user "
+    "the a of and to in for with on is are we our this that quickly rapidly build deliver grow"
+).split()
+
+
+def synthetic_text(num_tokens, seed=0):
+    rng = random.Random(seed)
+    words = [rng.choice(VOCABULARY) for _ in range(num_tokens)]
+    # Break the text into sentences so the tokenizer sees realistic input
+    for i in range(12, num_tokens, 12):
+        words[i] += '.'
+    return ' '.join(words)
+
+
+def run(sizes=SIZES, repeat=3):
+    parser = PitchDeckParser()
+    results = []
+    for size in sizes:
+        text = synthetic_text(size)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parser.extract_key_phrases(text)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results.append((size, best))
+        print(f"{size:>8} tokens: {best * 1000:9.1f} ms  ({best / size * 1e6:6.2f} us/token)")
+
+    smallest, largest = results[0], results[-1]
+    scaling = (largest[1] / largest[0]) / (smallest[1] / smallest[0])
+    print(f"per-token cost at {largest[0]} tokens is {scaling:.2f}x the cost at {smallest[0]} tokens "
+          f"(1.0 is perfectly linear)")
+    return results
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    run(sizes)
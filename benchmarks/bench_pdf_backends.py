@@ -0,0 +1,96 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from benchmarks.corpus import build_corpus
+from app import pdf_text
+
+
+def word_counts(texts):
+    return Counter(' '.join(text for text in texts if text).split())
+
+
+def agreement(texts, reference):
+    # Share of the reference's words the backend also found, counted with repeats
+    reference_words = word_counts(reference)
+    total = sum(reference_words.values())
+    return sum((word_counts(texts) & reference_words).values()) / total if total else 1.0
+
+
+def extract(backend, path):
+    return list(backend.iter_pages(path, range(backend.page_count(path))))
+
+
+def run(paths, backends, repeat=3):
+    results = {}
+    for name in backends:
+        backend = pdf_text.get_backend(name)
+        pages = 0
+        seconds = 0
+        texts = {}
+        for path in paths:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                texts[path] = extract(backend, path)
+                timings.append(time.perf_counter() - start)
+            pages += len(texts[path])
+            seconds += min(timings)
+        results[name] = {'pages': pages, 'seconds': seconds, 'texts': texts}
+
+    reference = results.get('pdfplumber')
+    print(f"{len(paths)} PDFs, {results[backends[0]]['pages']} pages, best of {repeat}")
+    print(f"  {'backend':<12} {'pages/s':>10} {'speedup':>8} {'words':>8}")
+    for name, result in results.items():
+        pages_per_second = result['pages'] / result['seconds']
+        if reference:
+            speedup = f"{reference['seconds'] / result['seconds']:7.1f}x"
+            words = f"{min(agreement(result['texts'][path], reference['texts'][path]) for path in paths):8.1%}"
+        else:
+            speedup = words = ''
+        print(f"  {name:<12} {pages_per_second:10.1f} {speedup:>8} {words:>8}")
+    if reference:
+        print("  words: lowest share of pdfplumber's words a backend found in any one PDF")
+
+    if 'pypdf' in results:
+        fast_texts = [text for texts in results['pypdf']['texts'].values() for text in texts]
+        retried = sum(1 for text in fast_texts if text is not None and pdf_text.looks_wrong(text))
+        skipped = sum(1 for text in fast_texts if text is None)
+        print(f"  auto: {retried} of {len(fast_texts)} pages fall back to pdfplumber, {skipped} have no fonts")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the throughput of the PDF text backends")
+    parser.add_argument('paths', nargs='*', help="PDFs or directories of PDFs to add to the synthetic corpus")
+    parser.add_argument('--documents', type=int, default=10, help="synthetic PDFs, 0 for none")
+    parser.add_argument('--slides', type=int, default=12)
+    parser.add_argument('--words', type=int, default=300, help="words per slide")
+    parser.add_argument('--backends', default=','.join(pdf_text.BACKENDS))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='documentreader-bench-')
+    try:
+        corpus = build_corpus(workdir, args.documents, args.slides, args.words, 0.3, ('pdf',))
+        paths = [path for path, _ in corpus]
+        for path in args.paths:
+            if os.path.isdir(path):
+                paths.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                             if name.lower().endswith('.pdf'))
+            else:
+                paths.append(path)
+        if not paths:
+            print("no PDFs to read")
+            return 1
+        run(paths, args.backends.split(','), args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+import argparse
+import json
+import math
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from benchmarks.corpus import build_corpus
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+METHODS = ('parse_pdf', 'parse_pptx', 'detect_document_type', 'extract_key_phrases', 'extract_summary', 'sentiment',
+           'analyze_content')
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(seconds):
+    return {
+        'p50_ms': percentile(seconds, 50) * 1000,
+        'p95_ms': percentile(seconds, 95) * 1000,
+        'p99_ms': percentile(seconds, 99) * 1000,
+        'per_second': len(seconds) / sum(seconds) if sum(seconds) else float('inf')
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux; children covers the PDF page pool
+    return max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)) / 1024
+
+
+def parse(parser, path, file_type):
+    return getattr(parser, f"parse_{file_type}")(path)
+
+
+def bench_methods(corpus):
+    from app.models import PitchDeckParser
+    # One parser per method, so no method profits from sentences another one already put in the sentiment cache
+    parsers = {method: PitchDeckParser() for method in METHODS}
+    calls = {
+        'detect_document_type': lambda parser, content: parser.detect_document_type(content),
+        'extract_key_phrases': lambda parser, content: parser.extract_key_phrases(content),
+        'extract_summary': lambda parser, content: parser.extract_summary(content),
+        'sentiment': lambda parser, content: parser.sentiment.compound(content),
+        'analyze_content': lambda parser, content: parser.analyze_content(content)
+    }
+    # Warm up imports and lazily loaded data on a throwaway parser
+    warm_up = PitchDeckParser()
+    for path, file_type in corpus[:2]:
+        content, _ = parse(warm_up, path, file_type)
+        warm_up.analyze_content(content)
+
+    timings = {method: [] for method in METHODS}
+    for path, file_type in corpus:
+        start = time.perf_counter()
+        content, _ = parse(parsers[f"parse_{file_type}"], path, file_type)
+        timings[f"parse_{file_type}"].append(time.perf_counter() - start)
+        # Each method gets the raw text, so it pays for the tokenizing it needs as it would on its own
+        for method, call in calls.items():
+            start = time.perf_counter()
+            call(parsers[method], content)
+            timings[method].append(time.perf_counter() - start)
+    for parser in parsers.values():
+        parser.close()
+    return {method: summarize(seconds) for method, seconds in timings.items() if seconds}
+
+
+def bench_worker(corpus, workdir, timeout=600):
+    # The real worker loop against in-process stand-ins: fakeredis for Redis and a SQLite file for Postgres
+    try:
+        import fakeredis
+    except ImportError:
+        print("fakeredis is not installed, skipping the end-to-end worker benchmark")
+        return None
+    import redis
+    from app import config, connections
+    server = fakeredis.FakeServer()
+
+    class LocalRedis(fakeredis.FakeRedis):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, server=server, **kwargs)
+
+    class LocalPool(connections.RedisPool):
+        # The worker's client comes from a pool, which fakeredis leaves alone, so its connections are swapped here
+        def __init__(self, **kwargs):
+            super().__init__(connection_class=fakeredis.FakeRedisConnection, server=server, **kwargs)
+
+    redis.Redis = LocalRedis
+    connections.RedisPool = LocalPool
+    config.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    from app import worker
+    from app.job_queue import enqueue
+    from app.job_status import job_key, FINAL_STATES
+    from app.models import db
+    worker.app.config.update(WORKER_METRICS_PORT=0, PROFILE_SLOWEST_JOBS=0)
+    with worker.app.app_context():
+        db.create_all()
+
+    upload_dir = os.path.join(workdir, 'uploads')
+    os.makedirs(upload_dir, exist_ok=True)
+    job_ids = []
+    for path, file_type in corpus:
+        # The worker deletes uploads once stored, so it gets copies
+        file_path = shutil.copy(path, upload_dir)
+        job_id = uuid.uuid4().hex
+        job_ids.append(job_id)
+        enqueue(worker.redis_client, {'job_id': job_id, 'filename': os.path.basename(path), 'file_path': file_path,
+                                      'size': os.path.getsize(path), 'file_type': file_type, 'size_class': 'small',
+                                      'timestamp': datetime.now().isoformat()})
+
+    finished = {}
+
+    def stop_when_done():
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            states = [worker.redis_client.hget(job_key(job_id), 'state') for job_id in job_ids]
+            if all(state in FINAL_STATES for state in states):
+                break
+            time.sleep(0.01)
+        finished['at'] = time.perf_counter()
+        worker.keep_running = False
+
+    watcher = threading.Thread(target=stop_when_done)
+    start = time.perf_counter()
+    watcher.start()
+    # Returns once its current wait for more jobs times out, which is not counted
+    worker.process_queue()
+    watcher.join()
+    elapsed = finished['at'] - start
+
+    jobs = [worker.redis_client.hgetall(job_key(job_id)) for job_id in job_ids]
+    stored = [job for job in jobs if job.get('state') == 'stored']
+    # From the worker taking the job to its group commit, without the time spent waiting in the queue
+    latencies = [float(job['stored_at']) - float(job['parsing_at']) for job in stored if 'parsing_at' in job]
+    result = {'documents': len(stored), 'failed': len(jobs) - len(stored), 'seconds': elapsed,
+              'documents_per_second': len(stored) / elapsed}
+    if latencies:
+        result.update({k: v for k, v in summarize(latencies).items() if k != 'per_second'})
+    return result
+
+
+def compare(results, baseline, tolerance):
+    if baseline['config'] != results['config']:
+        print("baseline was recorded with a different corpus, not comparing")
+        return []
+    regressions = []
+
+    def check(name, new, old, higher_is_better=False):
+        ratio = new / old if old else 1.0
+        worse = ratio < 1 / (1 + tolerance) if higher_is_better else ratio > 1 + tolerance
+        print(f"  {name:<40} {old:10.2f} -> {new:10.2f}  ({ratio:.2f}x){'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append(name)
+
+    print(f"compared with baseline (tolerance {tolerance:.0%}):")
+    for method, stats in results['methods'].items():
+        for key in ('p50_ms', 'p95_ms'):
+            check(f"{method} {key}", stats[key], baseline['methods'][method][key])
+    if results.get('worker') and baseline.get('worker'):
+        check("worker documents_per_second", results['worker']['documents_per_second'],
+              baseline['worker']['documents_per_second'], higher_is_better=True)
+    check("peak_rss_mb", results['peak_rss_mb'], baseline['peak_rss_mb'])
+    return regressions
+
+
+def report(results):
+    config = results['config']
+    print(f"{config['documents']} documents ({', '.join(config['formats'])}), {config['slides']} slides of "
+          f"{config['words']} words, {config['boilerplate']:.0%} boilerplate")
+    print(f"  {'method':<22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'docs/s':>9}")
+    for method, stats in results['methods'].items():
+        print(f"  {method:<22} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f} "
+              f"{stats['per_second']:9.1f}")
+    worker = results.get('worker')
+    if worker:
+        print(f"  worker: {worker['documents']} stored, {worker['failed']} failed in {worker['seconds']:.2f}s "
+              f"({worker['documents_per_second']:.1f} docs/s), latency p50 {worker.get('p50_ms', 0):.1f}ms "
+              f"p95 {worker.get('p95_ms', 0):.1f}ms")
+    print(f"  peak RSS {results['peak_rss_mb']:.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark parse, analyze and store on a synthetic corpus")
+    parser.add_argument('--documents', type=int, default=30)
+    parser.add_argument('--slides', type=int, default=12)
+    parser.add_argument('--words', type=int, default=80, help="words per slide")
+    parser.add_argument('--boilerplate', type=float, default=0.3, help="share of repeated boilerplate sentences")
+    parser.add_argument('--formats', default='pdf,pptx')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-worker', action='store_true', help="skip the end-to-end worker run")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before failing")
+    args = parser.parse_args(argv)
+
+    config = {'documents': args.documents, 'slides': args.slides, 'words': args.words,
+              'boilerplate': args.boilerplate, 'formats': args.formats.split(','), 'seed': args.seed}
+    workdir = tempfile.mkdtemp(prefix='documentreader-bench-')
+    try:
+        corpus = build_corpus(os.path.join(workdir, 'corpus'), args.documents, args.slides, args.words,
+                              args.boilerplate, config['formats'], args.seed)
+        results = {'config': config, 'methods': bench_methods(corpus)}
+        if not args.no_worker:
+            results['worker'] = bench_worker(corpus, workdir)
+        results['peak_rss_mb'] = peak_rss_mb()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(results)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"saved baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; record one with --save-baseline")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
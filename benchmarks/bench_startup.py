@@ -0,0 +1,63 @@
+import json
+import subprocess
+import sys
+import time
+
+MODULES = ('app.models', 'app.routes', 'nltk')
+WORDS = "our platform helps growing teams ship reliable products faster than ever".split()
+
+
+def import_profile(module):
+    # -X importtime reports "self | cumulative | name" in microseconds for every module imported
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    total = next(cumulative for _, cumulative, name in rows if name.strip() == module)
+    loads_nltk = any(name.strip().split('.')[0] == 'nltk' for _, _, name in rows)
+    slowest = sorted(rows, reverse=True)[:5]
+    return total / 1e6, loads_nltk, slowest
+
+
+def resource_load_times():
+    # A fresh interpreter, as a cold worker would start
+    result = subprocess.run([sys.executable, '-c', "import json; from app import nlp; print(json.dumps(nlp.preload()))"],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def pos_tag_call_times(calls):
+    import nltk
+    from app import nlp
+    nlp.tagger()
+    start = time.perf_counter()
+    for _ in range(calls):
+        nltk.pos_tag(WORDS)
+    per_call_nltk = (time.perf_counter() - start) / calls
+    start = time.perf_counter()
+    for _ in range(calls):
+        nlp.pos_tag(WORDS)
+    per_call_shared = (time.perf_counter() - start) / calls
+    return per_call_nltk, per_call_shared
+
+
+def run(calls=20):
+    for module in MODULES:
+        seconds, loads_nltk, slowest = import_profile(module)
+        print(f"import {module}: {seconds:.3f}s{' (imports nltk)' if loads_nltk else ''}")
+        for self_us, _, name in slowest:
+            print(f"    {self_us / 1000:8.1f}ms self  {name.strip()}")
+
+    print("first use of NLTK data: " + ", ".join(f"{name} {seconds:.3f}s"
+                                                 for name, seconds in resource_load_times().items()))
+    per_call_nltk, per_call_shared = pos_tag_call_times(calls)
+    print(f"pos_tag per call: nltk.pos_tag {per_call_nltk * 1000:.1f}ms, "
+          f"shared tagger {per_call_shared * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
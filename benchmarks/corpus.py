@@ -0,0 +1,111 @@
+import os
+import random
+import textwrap
+import pptx
+from pptx.util import Inches, Pt
+
+VOCABULARY = (
+    "market revenue growth customer platform data pipeline cloud product team strategy investor "
+    "real-time analytics mobile payments scalable infrastructure machine learning model user "
+    "the a of and to in for with on is are we our this that quickly rapidly build deliver grow "
+    "strong loyal happy slow expensive broken painful risk traction competition opportunity"
+).split()
+BOILERPLATE = [
+    "Confidential and proprietary, do not distribute without written consent.",
+    "Thank you!",
+    "Contact us at hello@example.com for more information.",
+    "This presentation contains forward-looking statements that involve risks and uncertainties.",
+]
+KINDS = ('pitch_deck', 'resume', 'generic')
+LINE_WIDTH = 90
+LINES_PER_PDF_PAGE = 50
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(VOCABULARY) for _ in range(words)).capitalize() + '.'
+
+
+def synthetic_slides(num_slides, words_per_slide, boilerplate_ratio, kind='generic', seed=0):
+    # Each slide is a list of lines; sentences of about 12 words, some replaced by repeated boilerplate
+    rng = random.Random(seed)
+    slides = []
+    for index in range(num_slides):
+        if kind == 'pitch_deck' and index < 3:
+            lines = [["The problem is", "The solution is", "The market is"][index] + ' ' + sentence(rng, 8).lower()]
+        elif kind == 'resume' and index < 3:
+            lines = [["Objective", "Experience", "Skills"][index]]
+        else:
+            lines = [f"Slide {index + 1}"]
+        words = 0
+        while words < words_per_slide:
+            if rng.random() < boilerplate_ratio:
+                text = rng.choice(BOILERPLATE)
+            else:
+                text = sentence(rng, 12)
+            words += len(text.split())
+            lines.extend(textwrap.wrap(text, LINE_WIDTH))
+        slides.append(lines)
+    return slides
+
+
+def pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path, slides):
+    # A minimal hand-written PDF: one Helvetica text stream per page, long slides continue on extra pages
+    pages = [slide[i:i + LINES_PER_PDF_PAGE] for slide in slides for i in range(0, len(slide), LINES_PER_PDF_PAGE)]
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for lines in pages:
+        stream = 'BT /F1 11 Tf 14 TL 50 760 Td\n' + ''.join(f"({pdf_escape(line)}) Tj T*\n" for line in lines) + 'ET'
+        data = stream.encode('latin-1', 'replace')
+        objects.append(b'<< /Length %d >>\nstream\n' % len(data) + data + b'\nendstream')
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>".encode())
+        kids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        out += b'%010d 00000 n \n' % offset
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def write_pptx(path, slides):
+    presentation = pptx.Presentation()
+    layout = presentation.slide_layouts[6]  # blank
+    for lines in slides:
+        slide = presentation.slides.add_slide(layout)
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(6.5))
+        frame = box.text_frame
+        frame.text = lines[0]
+        for line in lines[1:]:
+            paragraph = frame.add_paragraph()
+            paragraph.text = line
+            paragraph.font.size = Pt(10)
+    presentation.save(path)
+
+
+def build_corpus(directory, num_documents, num_slides, words_per_slide, boilerplate_ratio,
+                 formats=('pdf', 'pptx'), seed=0):
+    # Same arguments and seed give byte-for-byte the same PDFs and the same slide texts
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for index in range(num_documents):
+        file_type = formats[index % len(formats)]
+        kind = KINDS[index % len(KINDS)]
+        slides = synthetic_slides(num_slides, words_per_slide, boilerplate_ratio, kind, seed=seed + index)
+        path = os.path.join(directory, f"{kind}-{index:04d}.{file_type}")
+        (write_pdf if file_type == 'pdf' else write_pptx)(path, slides)
+        corpus.append((path, file_type))
+    return corpus
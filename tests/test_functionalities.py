@@ -1,13 +1,45 @@
 import unittest
+import asyncio
+import gc
 import os
+import signal
+import threading
+import time
+import multiprocessing
 import redis
 import json
 import re
+import hashlib
+import io
+import subprocess
+import sys
+import tempfile
+import zipfile
+from unittest import mock
+import nltk
+import pptx
+from pptx.util import Inches
+from sqlalchemy import event
+from werkzeug.datastructures import FileStorage
 from app.app import create_app
-from app.models import db, PitchDeck, PitchDeckParser
+from app.models import db, PitchDeck, PitchDeckParser, DocumentSegment, ANALYSIS_VERSION, upgrade_schema
+from app.sentiment import SentimentScorer
+from app.sections import SectionIndex
+from app.analysis import AnalysisContext
+from app.utils import DocumentTooLarge, UploadTypeMismatch, UPLOAD_CHUNK_SIZE, save_upload
+from app.job_queue import JobQueue, LEASES, DEAD_LETTER_QUEUE, enqueue, size_class
+from app.job_status import set_state
+from app import nlp, metrics, reanalyze, ingest, pdf_text, bootstrap, connections
 from nltk.sentiment import SentimentIntensityAnalyzer
 
 
+def idle_worker(index):
+    # Stands in for a worker process in the pool test; runs until SIGTERM clears keep_running
+    from app import worker
+    while worker.keep_running:
+        time.sleep(0.05)
+
+
 class TestPitchDeckFunctionalities(unittest.TestCase):
     def setUp(self):
         self.app = create_app()
@@ -32,6 +64,9 @@ class TestPitchDeckFunctionalities(unittest.TestCase):
         except redis.ConnectionError as e:
             self.fail(f"Failed to connect to Redis: {e}")
         self.redis_client.flushdb()
+        # Uploads are stored under new names; whatever a test leaves behind is removed after it
+        existing_uploads = set(os.listdir(self.app.config['UPLOAD_FOLDER']))
+        self.addCleanup(self.remove_new_uploads, existing_uploads)
 
         self.test_pdf_path = os.path.join(self.app.config['UPLOAD_FOLDER'], "Data Engineer.pdf")
         print(f"Looking for Data Engineer.pdf at: {self.test_pdf_path}")
@@ -60,6 +95,30 @@ class TestPitchDeckFunctionalities(unittest.TestCase):
         if os.path.exists(self.test_pptx_path):
             os.remove(self.test_pptx_path)
 
+    def remove_new_uploads(self, existing_uploads):
+        for name in set(os.listdir(self.app.config['UPLOAD_FOLDER'])) - existing_uploads:
+            os.remove(os.path.join(self.app.config['UPLOAD_FOLDER'], name))
+
+    def assert_dashboard_served_from_cache(self, pitch_deck):
+        # The save wrote the summary through to the warm cache, so the dashboard needs no database query
+        self.assertEqual(self.redis_client.zrange('dashboard:index', 0, -1), [f"{pitch_deck.id:012d}"])
+        cached = self.redis_client.hgetall(f"dashboard:doc:{pitch_deck.id}")
+        self.assertEqual(json.loads(cached['filename']), pitch_deck.filename)
+        self.assertEqual(json.loads(cached['document_type']), pitch_deck.document_type)
+
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record_statement)
+        try:
+            page = PitchDeck.dashboard_page(self.redis_client, self.app.config['DASHBOARD_PAGE_SIZE'])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record_statement)
+        self.assertEqual(statements, [])
+        self.assertEqual([summary['id'] for summary in page], [pitch_deck.id])
+
     def test_upload_endpoint_no_file(self):
         response = self.client.post('/api/upload')
         self.assertEqual(response.status_code, 400)
@@ -86,14 +145,21 @@ class TestPitchDeckFunctionalities(unittest.TestCase):
         self.assertEqual(response.status_code, 202)
         self.assertEqual(response.json, {
             'message': 'File queued for processing',
-            'filename': 'Data_Engineer.pdf'
+            'filename': 'Data_Engineer.pdf',
+            'job_id': response.json['job_id']
         })
 
         job = self.redis_client.lpop("processing_queue")
         self.assertIsNotNone(job, "No job was added to the queue")
         job_data = json.loads(job)
         self.assertEqual(job_data["filename"], "Data_Engineer.pdf", "Job filename mismatch")
-        self.assertEqual(job_data["file_path"], os.path.join(self.app.config['UPLOAD_FOLDER'], "Data_Engineer.pdf"))
+        self.assertEqual(job_data["file_path"], os.path.join(self.app.config['UPLOAD_FOLDER'],
+                                                             f"{job_data['job_id']}_Data_Engineer.pdf"))
+        self.assertEqual(os.path.getsize(job_data["file_path"]), os.path.getsize(self.test_pdf_path))
+        self.assertEqual(job_data["size"], os.path.getsize(self.test_pdf_path))
+        self.assertEqual(job_data["file_type"], "pdf")
+        self.assertEqual(job_data["size_class"], "small")
+        self.assertEqual(job_data["job_id"], response.json['job_id'])
 
         self.assertTrue(os.path.exists(self.test_pdf_path), f"File was not found at {self.test_pdf_path}")
 
@@ -111,16 +177,154 @@ class TestPitchDeckFunctionalities(unittest.TestCase):
         self.assertEqual(response.status_code, 202)
         self.assertEqual(response.json, {
             'message': 'File queued for processing',
-            'filename': 'test.pptx'
+            'filename': 'test.pptx',
+            'job_id': response.json['job_id']
         })
 
         job = self.redis_client.lpop("processing_queue")
         self.assertIsNotNone(job, "No job was added to the queue")
         job_data = json.loads(job)
         self.assertEqual(job_data["filename"], "test.pptx", "Job filename mismatch")
-        self.assertEqual(job_data["file_path"], os.path.join(self.app.config['UPLOAD_FOLDER'], "test.pptx"))
+        self.assertEqual(job_data["file_path"], os.path.join(self.app.config['UPLOAD_FOLDER'],
+                                                             f"{job_data['job_id']}_test.pptx"))
+
+        self.assertTrue(os.path.exists(job_data["file_path"]), f"File was not saved to {job_data['file_path']}")
+
+    def test_upload_endpoint_duplicate_file_reuses_analysis(self):
+        with open(self.test_pdf_path, "rb") as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        analysis = {
+            'word_count': 2,
+            'char_count': 12,
+            'sentiment_score': 0.5,
+            'sentiment_type': 'Positive',
+            'document_type': 'resume',
+            'problem': 'Test objective',
+            'experience': 'Test experience',
+            'skills': 'Test skills'
+        }
+        with self.app.app_context():
+            PitchDeck(
+                filename="Data Engineer.pdf",
+                content="Test content",
+                slide_count=3,
+                analysis=analysis,
+                content_hash=content_hash
+            ).save(self.redis_client)
+
+        with open(self.test_pdf_path, "rb") as f:
+            response = self.client.post(
+                '/api/upload',
+                content_type='multipart/form-data',
+                data={'file': (f, 'Duplicate Deck.pdf')}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['filename'], 'Duplicate_Deck.pdf')
+        self.assertIsNone(self.redis_client.lpop("processing_queue"), "Duplicate file was queued for processing")
+        self.assertFalse([name for name in os.listdir(self.app.config['UPLOAD_FOLDER'])
+                          if name.endswith('Duplicate_Deck.pdf')])
+
+        with self.app.app_context():
+            duplicate = db.session.get(PitchDeck, response.json['id'])
+            self.assertEqual(duplicate.filename, 'Duplicate_Deck.pdf')
+            self.assertEqual(duplicate.content_hash, content_hash)
+            self.assertEqual(duplicate.content, "Test content")
+            self.assertEqual(duplicate.skills, "Test skills")
+            self.assertEqual(PitchDeck.query.filter_by(content_hash=content_hash).count(), 2)
+
+    def test_upload_stream_endpoint(self):
+        with open(self.test_pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+
+        response = self.client.post('/api/upload/stream?filename=Streamed Deck.pdf', data=pdf_bytes,
+                                    content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json['filename'], 'Streamed_Deck.pdf')
+        job_data = json.loads(self.redis_client.lpop("processing_queue"))
+        self.assertEqual(job_data['content_hash'], hashlib.sha256(pdf_bytes).hexdigest())
+        self.assertEqual(job_data['filename'], 'Streamed_Deck.pdf')
+        self.assertTrue(os.path.exists(job_data['file_path']))
+
+        # Another file with the same name is stored next to the first instead of replacing it
+        other_bytes = pdf_bytes + b'\n% another version'
+        self.client.post('/api/upload/stream?filename=Streamed Deck.pdf', data=other_bytes)
+        other_job = json.loads(self.redis_client.lpop("processing_queue"))
+        self.assertNotEqual(other_job['file_path'], job_data['file_path'])
+        for job, content in ((job_data, pdf_bytes), (other_job, other_bytes)):
+            with open(job['file_path'], 'rb') as f:
+                self.assertEqual(f.read(), content)
+            self.assertEqual(job['content_hash'], hashlib.sha256(content).hexdigest())
+
+        response = self.client.post('/api/upload/stream', data=pdf_bytes, headers={'X-Filename': 'Fake.pptx'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {'error': 'File content does not match its format'})
+        self.assertFalse([name for name in os.listdir(self.app.config['UPLOAD_FOLDER']) if name.endswith('Fake.pptx')])
+        # The first chunk is enough to refuse the rest of the body
+        junk = io.BytesIO(b'junk' * UPLOAD_CHUNK_SIZE)
+        with self.assertRaises(UploadTypeMismatch):
+            save_upload(junk, os.path.join(self.app.config['UPLOAD_FOLDER'], 'junk.pdf'), file_type='pdf')
+        self.assertEqual(junk.tell(), UPLOAD_CHUNK_SIZE)
+        self.assertFalse([name for name in os.listdir(self.app.config['UPLOAD_FOLDER']) if name.startswith('junk')])
+
+        # ".pdf" loses its dot to secure_filename, which leaves no extension
+        response = self.client.post('/api/upload/stream', data=pdf_bytes, headers={'X-Filename': '.pdf'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {'error': 'Unsupported file format'})
+
+        self.app.config['STREAM_MAX_CONTENT_LENGTH'] = 1024
+        response = self.client.post('/api/upload/stream?filename=Too Big.pdf', data=pdf_bytes)
+        self.assertEqual(response.status_code, 413)
+        self.assertIsNone(self.redis_client.lpop("processing_queue"))
+
+    def test_asgi_app_serves_uploads_and_documents(self):
+        from app.asgi import create_app as create_asgi_app
+        from app.routes import upload_path
+        with open(self.test_pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+        asgi_app = create_asgi_app()
+
+        async def exercise():
+            async with asgi_app.test_app() as test_app:
+                client = test_app.test_client()
+                response = await client.post('/api/upload/stream', data=pdf_bytes,
+                                             headers={'X-Filename': 'ASGI Deck.pdf'})
+                self.assertEqual(response.status_code, 202)
+                job_id = (await response.get_json())['job_id']
+                response = await client.get(f'/api/jobs/{job_id}')
+                self.assertEqual((await response.get_json())['state'], 'queued')
+                streamed_path = upload_path(asgi_app.config, job_id, 'ASGI_Deck.pdf')
+                self.assertEqual(os.path.getsize(streamed_path), len(pdf_bytes))
+                os.remove(streamed_path)
+                response = await client.post('/api/upload/stream', data=pdf_bytes, headers={'X-Filename': 'Fake.pptx'})
+                self.assertEqual(response.status_code, 400)
 
-        self.assertTrue(os.path.exists(self.test_pptx_path), f"File was not saved to {self.test_pptx_path}")
+                # The multipart route keeps the smaller limit although the stream route accepts larger bodies
+                asgi_app.config['MAX_CONTENT_LENGTH'] = len(pdf_bytes) // 2
+                response = await client.post('/api/upload', files={
+                    'file': FileStorage(io.BytesIO(pdf_bytes), filename='Too Big.pdf')})
+                self.assertEqual(response.status_code, 413)
+                response = await client.post('/api/upload/stream', data=pdf_bytes, headers={'X-Filename': 'Big Stream.pdf'})
+                self.assertEqual(response.status_code, 202)
+                os.remove(upload_path(asgi_app.config, (await response.get_json())['job_id'], 'Big_Stream.pdf'))
+                asgi_app.config['MAX_CONTENT_LENGTH'] = len(pdf_bytes) * 2
+                response = await client.post('/api/upload', files={
+                    'file': FileStorage(io.BytesIO(pdf_bytes), filename='Form Deck.pdf')})
+                self.assertEqual(response.status_code, 202)
+                os.remove(upload_path(asgi_app.config, (await response.get_json())['job_id'], 'Form_Deck.pdf'))
+
+                with self.app.app_context():
+                    PitchDeck("Data Engineer.pdf", "Test content", 3,
+                              {'word_count': 2, 'char_count': 12, 'sentiment_score': 0.5, 'sentiment_type': 'Positive'},
+                              content_hash=hashlib.sha256(pdf_bytes).hexdigest()).save(self.redis_client)
+                response = await client.post('/api/upload/stream', data=pdf_bytes, headers={'X-Filename': 'Copy.pdf'})
+                self.assertEqual(response.status_code, 200)
+                document_id = (await response.get_json())['id']
+                response = await client.get(f'/api/documents/{document_id}')
+                self.assertEqual((await response.get_json())['content'], "Test content")
+                response = await client.get('/')
+                self.assertIn('Copy.pdf', await response.get_data(as_text=True))
+
+        asyncio.run(exercise())
 
     def test_worker_processing_pdf(self):
         job = {
@@ -148,6 +352,7 @@ class TestPitchDeckFunctionalities(unittest.TestCase):
                 analysis=analysis,
                 status="processed"
             )
+            PitchDeck.warm_cache(self.redis_client)
             pitch_deck.save(self.redis_client)
 
         with self.app.app_context():
@@ -172,8 +377,7 @@ class TestPitchDeckFunctionalities(unittest.TestCase):
             self.assertIsNone(pitch_deck.market)
             self.assertIsNone(pitch_deck.summary)
             self.assertIsNone(pitch_deck.key_phrases)
-
-        self.assertIsNone(self.redis_client.get('dashboard_data'), "Redis cache was not invalidated")
+            self.assert_dashboard_served_from_cache(pitch_deck)
 
     def test_worker_processing_generic_pdf(self):
         job = {
@@ -201,6 +405,7 @@ class TestPitchDeckFunctionalities(unittest.TestCase):
                 analysis=analysis,
                 status="processed"
             )
+            PitchDeck.warm_cache(self.redis_client)
             pitch_deck.save(self.redis_client)
 
         with self.app.app_context():
@@ -225,8 +430,453 @@ class TestPitchDeckFunctionalities(unittest.TestCase):
             self.assertIsNone(pitch_deck.market)
             self.assertIsNone(pitch_deck.experience)
             self.assertIsNone(pitch_deck.skills)
+            self.assert_dashboard_served_from_cache(pitch_deck)
+
+    def test_job_status_endpoints(self):
+        with open(self.test_pdf_path, "rb") as f:
+            response = self.client.post(
+                '/api/upload',
+                content_type='multipart/form-data',
+                data={'file': (f, 'Data Engineer.pdf')}
+            )
+        job_id = response.json['job_id']
+
+        response = self.client.get(f'/api/jobs/{job_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['state'], 'queued')
+        self.assertEqual(response.json['filename'], 'Data_Engineer.pdf')
+        self.assertEqual(self.client.get('/api/jobs/unknown').status_code, 404)
+
+        set_state(self.redis_client, job_id, 'parsing', 60)
+        set_state(self.redis_client, job_id, 'stored', 60, document_id=7)
+        response = self.client.get(f'/api/jobs/{job_id}')
+        self.assertEqual(response.json['state'], 'stored')
+        self.assertEqual(response.json['document_id'], 7)
+        self.assertGreaterEqual(response.json['elapsed'], 0)
+        self.assertLessEqual(response.json['queued_at'], response.json['parsing_at'])
+
+        # A finished job's event stream sends its final state and ends
+        response = self.client.get(f'/api/jobs/{job_id}/events')
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        body = response.get_data(as_text=True)
+        self.assertTrue(body.startswith('event: stored\ndata: '))
+        self.assertEqual(json.loads(body.split('data: ', 1)[1])['document_id'], 7)
+
+    def test_open_event_streams_leave_redis_connections_for_other_requests(self):
+        set_state(self.redis_client, 'waiting-job', 'queued', 60, filename='Data_Engineer.pdf')
+        # As many streams as the request pool has connections, each subscribed and waiting for the next event
+        for _ in range(self.app.config['REDIS_MAX_CONNECTIONS']):
+            response = self.client.get('/api/jobs/waiting-job/events', buffered=False)
+            self.addCleanup(response.close)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(next(iter(response.response)).startswith(b'event: queued\n'))
+
+        started = time.monotonic()
+        response = self.client.get('/api/jobs/waiting-job')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['state'], 'queued')
+        self.assertEqual(self.client.get('/').status_code, 200)
+        self.assertLess(time.monotonic() - started, self.app.config['REDIS_POOL_TIMEOUT'])
+
+    def test_metrics_endpoint(self):
+        with open(self.test_pdf_path, "rb") as f:
+            self.client.post(
+                '/api/upload',
+                content_type='multipart/form-data',
+                data={'file': (f, 'Data Engineer.pdf')}
+            )
+        parser = PitchDeckParser()
+        content, _ = parser.parse_pdf(self.test_pdf_path)
+        parser.analyze_content(content)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        body = response.get_data(as_text=True)
+        self.assertIn('documentreader_queue_depth{queue="small"} 1', body)
+        self.assertRegex(body, r'documentreader_http_requests_total\{endpoint="upload_file",status="202"\} \d+')
+        for stage in ('sentiment', 'detect_type', 'sent_tokenize', 'key_phrases', 'summary'):
+            self.assertRegex(body, rf'documentreader_stage_seconds_count\{{stage="{stage}"\}} [1-9]')
+
+        histogram = metrics.Histogram('test_seconds', 'Test histogram', buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value)
+        self.assertEqual(histogram.render()[2:], [
+            'test_seconds_bucket{le="0.1"} 2',
+            'test_seconds_bucket{le="1"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            'test_seconds_sum 5.65',
+            'test_seconds_count 4'
+        ])
+
+    def test_redis_pools_count_their_connections(self):
+        pool = connections.RedisPool(**connections.redis_options(self.app.config))
+        first = pool.get_connection('PING')
+        second = pool.get_connection('PING')
+        self.assertEqual(pool.usage(), (2, 0))
+        pool.release(first)
+        self.assertEqual(pool.usage(), (1, 1))
+        # A released connection is handed out again before another is opened
+        self.assertIs(pool.get_connection('PING'), first)
+        self.assertEqual(pool.usage(), (2, 0))
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual(pool.usage(), (0, 2))
+        pool.reset()
+        self.assertEqual(pool.usage(), (0, 0))
+
+        async def check_async_pool():
+            pool = connections.AsyncRedisPool(**connections.redis_options(self.app.config))
+            first = await pool.get_connection('PING')
+            second = await pool.get_connection('PING')
+            self.assertEqual(pool.usage(), (2, 0))
+            await pool.release(first)
+            self.assertEqual(pool.usage(), (1, 1))
+            await pool.release(second)
+            self.assertEqual(pool.usage(), (0, 2))
+            await pool.disconnect()
+
+        asyncio.run(check_async_pool())
+        for connection in (first, second):
+            connection.disconnect()
+
+    def test_connection_pools_are_configured_and_reported(self):
+        with self.app.app_context():
+            self.assertEqual(db.engine.pool.size(), self.app.config['DB_POOL_SIZE'])
+            self.assertEqual(db.session.execute(db.text("SHOW statement_timeout")).scalar(),
+                             f"{self.app.config['DB_STATEMENT_TIMEOUT_MS'] // 1000}s")
+            db.drop_all()
+            # What the command-line tools check before they start
+            self.assertIn('pitch_decks', bootstrap.missing_tables())
+        # Creating an existing database is skipped; tables and indexes are created again
+        self.assertFalse(bootstrap.create_database(self.app.config['SQLALCHEMY_DATABASE_URI']))
+        bootstrap.create_tables(self.app)
+        with self.app.app_context():
+            self.assertIn('pitch_decks', db.inspect(db.engine).get_table_names())
+            self.assertEqual(bootstrap.missing_tables(), [])
+
+        body = self.client.get('/metrics').get_data(as_text=True)
+        self.assertRegex(body, r'documentreader_db_pool_connections\{state="idle"\} [1-9]')
+        self.assertIn(f"documentreader_db_pool_max_connections "
+                      f"{self.app.config['DB_POOL_SIZE'] + self.app.config['DB_MAX_OVERFLOW']}", body)
+        self.assertIn(f"documentreader_redis_pool_max_connections {self.app.config['REDIS_MAX_CONNECTIONS']}", body)
+        self.assertRegex(body, r'documentreader_redis_pool_connections\{state="in_use"\} \d+')
+
+    def test_job_queue_requeues_unacknowledged_jobs(self):
+        job_queue = JobQueue(self.redis_client, 'test-worker', visibility_timeout=0, max_attempts=2)
+        job_json = json.dumps({'file_path': self.test_pdf_path, 'filename': 'Data Engineer.pdf'})
+        self.redis_client.lpush('processing_queue', job_json)
+
+        self.assertEqual(job_queue.reserve(1), job_json)
+        self.assertEqual(self.redis_client.llen('processing_queue'), 0)
+        self.assertEqual(self.redis_client.lrange('processing:test-worker', 0, -1), [job_json])
+
+        reaped = job_queue.reap()
+        self.assertEqual([outcome for _, outcome in reaped], ['requeued'])
+        self.assertEqual(self.redis_client.llen('processing:test-worker'), 0)
+        retry_json = job_queue.reserve(1)
+        self.assertEqual(json.loads(retry_json)['attempts'], 1)
+
+        self.assertEqual(job_queue.fail(retry_json), 'dead')
+        self.assertEqual(self.redis_client.llen('processing_queue'), 0)
+        self.assertEqual(json.loads(self.redis_client.lindex(DEAD_LETTER_QUEUE, 0))['attempts'], 2)
+
+        self.redis_client.lpush('processing_queue', job_json)
+        job_queue.ack(job_queue.reserve(1))
+        self.assertEqual(self.redis_client.llen('processing:test-worker'), 0)
+        self.assertEqual(self.redis_client.hlen(LEASES), 0)
+
+        # A job found without a lease gets one, unless it is acknowledged while the reaper looks at it
+        self.redis_client.lpush('processing_queue', job_json)
+        self.assertEqual(job_queue.reserve(1), job_json)
+        self.redis_client.hdel(LEASES, job_json)
+        job_queue.visibility_timeout = 60
+        self.assertEqual(job_queue.reap(), [])
+        self.assertTrue(self.redis_client.hexists(LEASES, job_json))
+        self.redis_client.hdel(LEASES, job_json)
+        lrange = self.redis_client.lrange
+
+        def lrange_then_ack(*args):
+            jobs = lrange(*args)
+            job_queue.ack(job_json)
+            return jobs
+
+        with mock.patch.object(self.redis_client, 'lrange', side_effect=lrange_then_ack):
+            self.assertEqual(job_queue.reap(), [])
+        self.assertEqual(self.redis_client.hlen(LEASES), 0)
+
+    def test_job_queue_renews_leases_of_running_jobs(self):
+        job_queue = JobQueue(self.redis_client, 'busy-worker', visibility_timeout=0.5)
+        reaper = JobQueue(self.redis_client, 'reaper', visibility_timeout=0.5)
+        job_json = json.dumps({'file_path': self.test_pdf_path, 'filename': 'Data Engineer.pdf'})
+        self.redis_client.lpush('processing_queue', job_json)
+        self.assertEqual(job_queue.reserve(1), job_json)
+
+        # A job worked on for longer than the visibility timeout keeps its lease
+        heartbeat = job_queue.start_heartbeat(interval=0.1)
+        time.sleep(1.2)
+        self.assertEqual(reaper.reap(), [])
+        heartbeat.set()
+        time.sleep(0.7)
+        self.assertEqual([outcome for _, outcome in reaper.reap()], ['requeued'])
+        # A re-queued job's lease is not brought back
+        self.assertEqual(job_queue.renew(), 0)
+        self.assertEqual(self.redis_client.hlen(LEASES), 0)
+
+        # Past max_lease_time a stuck worker's job is left to expire
+        stuck = JobQueue(self.redis_client, 'stuck-worker', visibility_timeout=0.5, max_lease_time=0)
+        stuck.reserve(1)
+        self.assertEqual(stuck.renew(), 0)
+
+    def test_job_queue_serves_size_classes_by_weight(self):
+        for queue_class in ('small', 'large'):
+            for i in range(10):
+                enqueue(self.redis_client, {'filename': f'{queue_class}-{i}.pdf', 'size_class': queue_class})
 
-        self.assertIsNone(self.redis_client.get('dashboard_data'), "Redis cache was not invalidated")
+        job_queue = JobQueue(self.redis_client, 'test-worker', weights={'small': 3, 'large': 1})
+        served = [json.loads(job_queue.reserve(1))['size_class'] for _ in range(8)]
+        self.assertEqual(served.count('small'), 6)
+        self.assertEqual(served.count('large'), 2)
+
+        large_only = JobQueue(self.redis_client, 'large-worker', size_classes=['large'])
+        self.assertEqual(json.loads(large_only.reserve(1))['size_class'], 'large')
+        self.assertEqual(size_class(10 * 1024 * 1024, self.app.config['QUEUE_MEDIUM_MIN_BYTES'],
+                                    self.app.config['QUEUE_LARGE_MIN_BYTES']), 'medium')
+
+    def test_worker_pool_restarts_crashed_processes(self):
+        from app import worker
+        worker.app.config['WORKER_RESTART_DELAY'] = 0.2
+        self.addCleanup(setattr, worker, 'keep_running', True)
+        self.addCleanup(gc.unfreeze)
+
+        def wait_for_pool(condition):
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                processes = {p.name: p for p in multiprocessing.active_children() if p.name.startswith('worker-')}
+                if condition(processes):
+                    return processes
+                time.sleep(0.05)
+            self.fail("Worker pool did not reach the expected state")
+
+        with mock.patch.object(worker, 'worker_process_main', idle_worker):
+            supervisor = threading.Thread(target=worker.run_pool, args=(2,))
+            supervisor.start()
+            started = wait_for_pool(lambda processes: len(processes) == 2)
+            os.kill(started['worker-0'].pid, signal.SIGKILL)
+            restarted = wait_for_pool(lambda processes: len(processes) == 2
+                                      and processes['worker-0'].pid != started['worker-0'].pid)
+            self.assertEqual(restarted['worker-1'].pid, started['worker-1'].pid)
+
+            # Shutting down passes SIGTERM on, and the workers finish on their own
+            worker.signal_handler(signal.SIGTERM, None)
+            supervisor.join(timeout=30)
+            self.assertFalse(supervisor.is_alive())
+        self.assertEqual(started['worker-0'].exitcode, -signal.SIGKILL)
+        self.assertEqual([restarted[name].exitcode for name in ('worker-0', 'worker-1')], [0, 0])
+
+    def test_job_queue_interleaves_again_after_a_class_drains(self):
+        job_queue = JobQueue(self.redis_client, 'test-worker', weights={'small': 3, 'large': 1})
+
+        def serve(count):
+            return [json.loads(job_queue.reserve(1))['size_class'] for _ in range(count)]
+
+        def fill(counts):
+            for queue_class, count in counts.items():
+                for i in range(count):
+                    enqueue(self.redis_client, {'filename': f'{queue_class}-{i}.pdf', 'size_class': queue_class})
+
+        # While one queue is empty it builds no credit, and the busy one owes none once both have work again
+        fill({'small': 50})
+        serve(50)
+        fill({'small': 10, 'large': 10})
+        served = serve(4)
+        self.assertEqual((served.count('small'), served.count('large')), (3, 1))
+
+        serve(16)
+        fill({'large': 50})
+        serve(50)
+        fill({'small': 10, 'large': 10})
+        served = serve(4)
+        self.assertEqual((served.count('small'), served.count('large')), (3, 1))
+
+    def test_parse_pdf_parallel_matches_serial(self):
+        pdf_path = os.path.join(self.app.config['UPLOAD_FOLDER'], "Uber-Pitch-Deck.pdf")
+        serial_parser = PitchDeckParser(sia=SentimentIntensityAnalyzer())
+        parallel_parser = PitchDeckParser(sia=SentimentIntensityAnalyzer(), pdf_workers=2, pdf_parallel_min_pages=1)
+        try:
+            serial_content, serial_count = serial_parser.parse_pdf(pdf_path)
+            parallel_content, parallel_count = parallel_parser.parse_pdf(pdf_path)
+        finally:
+            parallel_parser.close()
+
+        self.assertEqual(parallel_count, serial_count)
+        self.assertEqual(parallel_content, serial_content)
+
+    def test_parse_pdf_bounded_matches_serial_and_enforces_budget(self):
+        pdf_path = os.path.join(self.app.config['UPLOAD_FOLDER'], "Uber-Pitch-Deck.pdf")
+        serial_parser = PitchDeckParser(sia=SentimentIntensityAnalyzer())
+        bounded_parser = PitchDeckParser(sia=SentimentIntensityAnalyzer(), pdf_bounded_min_pages=1)
+        bounded_parser.pdf_pages_per_open = 3
+        self.assertEqual(bounded_parser.parse_pdf(pdf_path), serial_parser.parse_pdf(pdf_path))
+
+        slow_parser = PitchDeckParser(sia=SentimentIntensityAnalyzer(), pdf_time_budget=1e-9)
+        with self.assertRaises(DocumentTooLarge):
+            slow_parser.parse_pdf(pdf_path)
+
+        with self.app.app_context():
+            PitchDeck.too_large("Huge Report.pdf", "PDF extraction took longer than 600s").save(self.redis_client)
+            pitch_deck = PitchDeck.query.filter_by(filename="Huge Report.pdf").first()
+            self.assertEqual(pitch_deck.status, 'too_large')
+            self.assertEqual(pitch_deck.summary, "PDF extraction took longer than 600s")
+            self.assertEqual(reanalyze.pending_documents(0, 10), [])
+
+    def test_pdf_text_backends_fall_back_on_bad_pages(self):
+        pdf_path = os.path.join(self.app.config['UPLOAD_FOLDER'], "Data Engineer.pdf")
+        fast_parser = PitchDeckParser(sia=SentimentIntensityAnalyzer(), pdf_backend='pypdf')
+        fast_content, fast_count = fast_parser.parse_pdf(pdf_path)
+        self.assertIn("Aspiring Data Engineer Intern", fast_content)
+        self.assertEqual(fast_count, 3)
+
+        self.assertTrue(pdf_text.looks_wrong(''))
+        self.assertTrue(pdf_text.looks_wrong(' '.join("Revenue grows every quarter")))
+        self.assertTrue(pdf_text.looks_wrong('\ufffd' * 40))
+        self.assertTrue(pdf_text.looks_wrong("Revenuegrowseveryquarterforourcustomers" * 3))
+        self.assertFalse(pdf_text.looks_wrong("Revenue grows every quarter for our customers."))
+
+        class FirstPageGarbled:
+            name = 'garbled'
+
+            def iter_pages(self, file_path, indexes):
+                for index in indexes:
+                    yield '\ufffd' * 40 if index == 0 else f"Page {index + 1} read by the fast backend"
+
+        careful = pdf_text.BACKENDS['pdfplumber']
+        texts = list(pdf_text.FallbackBackend(FirstPageGarbled(), careful).iter_pages(pdf_path, range(3)))
+        self.assertEqual(texts[0], next(careful.iter_pages(pdf_path, [0])))
+        self.assertEqual(texts[1:], ["Page 2 read by the fast backend", "Page 3 read by the fast backend"])
+        with self.assertRaises(ValueError):
+            PitchDeckParser(sia=SentimentIntensityAnalyzer(), pdf_backend='ocr')
+
+    def test_parse_pptx_reads_groups_tables_and_notes(self):
+        pptx_path = os.path.join(self.app.config['UPLOAD_FOLDER'], "shapes.pptx")
+        presentation = pptx.Presentation()
+        for index in range(3):
+            slide = presentation.slides.add_slide(presentation.slide_layouts[5])
+            slide.shapes.title.text = f"Market slide {index}"
+            group = slide.shapes.add_group_shape()
+            group.shapes.add_textbox(Inches(1), Inches(2), Inches(3), Inches(1)).text = f"Grouped point {index}"
+            table = slide.shapes.add_table(2, 2, Inches(1), Inches(4), Inches(4), Inches(1)).table
+            table.cell(0, 0).text = "Revenue"
+            table.cell(0, 1).text = "$2M"
+            slide.notes_slide.notes_text_frame.text = f"Speaker note {index}"
+        presentation.save(pptx_path)
+        self.addCleanup(os.remove, pptx_path)
+
+        parser = PitchDeckParser(sia=SentimentIntensityAnalyzer())
+        segments = parser.pptx_segments(pptx_path)
+        self.assertEqual([segment['slide'] for segment in segments], [1, 2, 3])
+        self.assertEqual(segments[0]['text'], "Market slide 0\nGrouped point 0\nRevenue\t$2M")
+        self.assertEqual(segments[0]['notes'], "Speaker note 0")
+        content, slide_count = parser.parse_pptx(pptx_path)
+        self.assertEqual(slide_count, 3)
+        self.assertIn("Grouped point 2\nRevenue\t$2M\nSpeaker note 2", content)
+
+        without_notes = PitchDeckParser(sia=SentimentIntensityAnalyzer(), pptx_notes=False)
+        self.assertNotIn("Speaker note", without_notes.parse_pptx(pptx_path)[0])
+        parallel_parser = PitchDeckParser(sia=SentimentIntensityAnalyzer(), pptx_workers=2,
+                                          pptx_parallel_min_slides=1)
+        parallel_parser.pptx_slides_per_task = 1
+        try:
+            self.assertEqual(parallel_parser.pptx_segments(pptx_path), segments)
+        finally:
+            parallel_parser.close()
+
+    def test_nlp_resources_load_lazily_from_local_data(self):
+        self.assertEqual(nlp.missing_resources(), [])
+        imported = subprocess.run([sys.executable, '-c', "import sys, app.models; print('nltk' in sys.modules)"],
+                                  capture_output=True, text=True, check=True)
+        self.assertEqual(imported.stdout.strip(), 'False')
+
+        words = nlp.word_tokenize("our platform helps growing teams ship reliable products")
+        self.assertEqual(nlp.pos_tag(words), nltk.pos_tag(words))
+        self.assertIs(nlp.tagger(), nlp.tagger())
+        self.assertIs(PitchDeckParser().sia, PitchDeckParser().sia)
+
+    def test_sentence_sentiment_agrees_with_document_score(self):
+        sia = SentimentIntensityAnalyzer()
+        parser = PitchDeckParser(sia=sia)
+        scorer = SentimentScorer(sia)
+        # Scoring per sentence only loses negation/"but" context across sentence boundaries
+        tolerance = 0.05
+        for pdf_path in (self.test_pdf_path, self.test_generic_pdf_path):
+            content, _ = parser.parse_pdf(pdf_path)
+            self.assertAlmostEqual(scorer.compound(content), sia.polarity_scores(content)['compound'],
+                                   delta=tolerance)
+
+        boilerplate = "Thank you for your time! Contact us at info@example.com."
+        scores = scorer.score_many([f"Our product is great. {boilerplate}", f"Sales are bad. {boilerplate}"])
+        self.assertGreater(scores[0], 0.05)
+        self.assertLess(scores[1], scores[0])
+        hits = scorer.hits
+        scorer.compound(boilerplate)
+        self.assertGreater(scorer.hits, hits)
+
+        # Within a sentence the scorer repeats VADER exactly, "but" and punctuation emphasis included
+        text = "We met the founders in March. The demo was great, but the pricing is terrible!!!"
+        self.assertEqual(scorer.score_many([text]), [sia.polarity_scores(text)['compound']])
+
+    def test_section_index_finds_sections_and_document_types(self):
+        parser = PitchDeckParser()
+        text = ("Objective\nBuild reliable data pipelines\n\nData Engineer Intern\nAcme Corp 2024\n"
+                "Experience\nBuilt ETL jobs\nSkills\nPython, SQL\nEducation\nBSc")
+        sections = SectionIndex.from_text(text.lower())
+        # A section ends at a blank line, the next heading or max_lines
+        self.assertEqual(sections.section('objective'), "objective build reliable data pipelines")
+        self.assertEqual(sections.section('skills'), "skills python, sql")
+        self.assertEqual(sections.section('skills', max_lines=0), "skills")
+        self.assertIsNone(sections.section('certifications'))
+        # Experience starts at the first job title when that comes before the heading
+        self.assertEqual(sections.section('experience'), "data engineer intern acme corp 2024")
+        self.assertEqual(parser.extract_section(text.lower().split('\n'), 'education'), "education bsc")
+
+        self.assertEqual(parser.detect_document_type(text), 'resume')
+        self.assertEqual(parser.detect_document_type("Objective\nGrow\nSkills: Python"), 'generic')
+        self.assertEqual(parser.detect_document_type("Summary: Grow\nExperience\nAcme"), 'generic')
+        self.assertEqual(parser.detect_document_type("Our problem is slow hiring.\nSkills\nPython"), 'pitch_deck')
+
+    def test_key_phrases_tie_break_on_phrase_position(self):
+        parser = PitchDeckParser()
+        # "zebra" appears first on its own, but "apple orchard" starts before "zebra stripes" does
+        tokens = ['zebra', 'runs', 'apple', 'orchard', 'runs', 'zebra', 'stripes',
+                  'runs', 'apple', 'orchard', 'runs', 'zebra', 'stripes']
+        tags = ['VBZ' if token == 'runs' else 'NN' for token in tokens]
+        context = AnalysisContext.from_segments([{'text': ' '.join(tokens), 'sentences': [' '.join(tokens)],
+                                                  'tokens': tokens, 'tags': tags, 'valence': 0.0}],
+                                                parser.stop_words)
+        self.assertEqual(parser.extract_key_phrases(context, top_n=2), ['apple orchard', 'zebra stripes'])
+
+    def test_analysis_stages_share_tokenization_and_tagging(self):
+        parser = PitchDeckParser(sia=SentimentIntensityAnalyzer())
+        text = ("Acme builds scalable cloud platform tools. Customers love the cloud platform dashboards. "
+                "Revenue grows every quarter.")
+        with mock.patch.object(nlp, 'sent_tokenize', wraps=nlp.sent_tokenize) as sent_tokenize, \
+                mock.patch.object(nlp, 'word_tokenize', wraps=nlp.word_tokenize) as word_tokenize, \
+                mock.patch.object(nlp, 'pos_tag', wraps=nlp.pos_tag) as pos_tag:
+            context = parser.context(text)
+            analysis = parser.analyze_content(context)
+            self.assertEqual(analysis['document_type'], 'generic')
+            self.assertEqual(parser.extract_key_phrases(context, top_n=5), analysis['key_phrases'])
+            self.assertEqual(parser.extract_summary(context), analysis['summary'])
+            # Key phrases, summary and the problem fallback all reuse one tokenization and tagging
+            self.assertEqual((sent_tokenize.call_count, word_tokenize.call_count, pos_tag.call_count), (1, 1, 1))
+
+            # A document analyzed again from its stored segment results needs none of them
+            segment = parser.analyze_segment({'text': text})
+            for stage in (sent_tokenize, word_tokenize, pos_tag):
+                stage.reset_mock()
+            self.assertEqual(parser.analyze_content(parser.segment_context([segment]))['key_phrases'],
+                             analysis['key_phrases'])
+            self.assertEqual((sent_tokenize.call_count, word_tokenize.call_count, pos_tag.call_count), (0, 0, 0))
 
     def test_database_save_and_retrieve(self):
         analysis = {
@@ -268,6 +918,197 @@ class TestPitchDeckFunctionalities(unittest.TestCase):
             self.assertIsNone(retrieved_deck.summary)
             self.assertIsNone(retrieved_deck.key_phrases)
 
+    def test_dashboard_pagination_and_detail(self):
+        self.app.config['DASHBOARD_PAGE_SIZE'] = 2
+        analysis = {
+            'word_count': 2,
+            'char_count': 12,
+            'sentiment_score': 0.5,
+            'sentiment_type': 'Positive',
+            'document_type': 'pitch_deck'
+        }
+        with self.app.app_context():
+            for i in range(5):
+                PitchDeck(
+                    filename=f"Deck {i}.pdf",
+                    content=f"Full text of deck {i}",
+                    slide_count=1,
+                    analysis=dict(analysis, upload_date=f"2025-01-0{i + 1} 00:00:00")
+                ).save(self.redis_client)
+
+        filenames = []
+        url = '/'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            html = response.get_data(as_text=True)
+            self.assertNotIn("Full text of deck", html)
+            filenames.extend(re.findall(r'<h2>(.*?)</h2>', html))
+            next_link = re.search(r'href="(/\?before=[^"]+)"', html)
+            url = next_link.group(1).replace('&amp;', '&') if next_link else None
+        self.assertEqual(filenames, [f"Deck {i}.pdf" for i in reversed(range(5))])
+
+        self.assertEqual(self.client.get('/?before=not-a-cursor').status_code, 400)
+
+        with self.app.app_context():
+            document_id = PitchDeck.query.filter_by(filename="Deck 3.pdf").first().id
+        response = self.client.get(f'/api/documents/{document_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['content'], "Full text of deck 3")
+        self.assertEqual(self.client.get('/api/documents/999999').status_code, 404)
+
+    def test_search_ranks_filters_and_highlights(self):
+        documents = [
+            ("Fintech Deck.pdf", "Our payments & FX platform moves money across borders.", 'pitch_deck',
+             'Positive', ['cross-border payments']),
+            ("Backend Engineer.pdf", "Engineer who built payments systems at scale.", 'resume', 'Neutral', None),
+            ("Farming Deck.pdf", "Tractors and sensors for small farms.", 'pitch_deck', 'Positive', None)
+        ]
+        with self.app.app_context():
+            # setUp recreated the tables from the models, without the search column
+            upgrade_schema()
+            for filename, content, document_type, sentiment_type, key_phrases in documents:
+                PitchDeck(filename=filename, content=content, slide_count=1, analysis={
+                    'word_count': len(content.split()), 'char_count': len(content), 'sentiment_score': 0.1,
+                    'sentiment_type': sentiment_type, 'document_type': document_type, 'key_phrases': key_phrases
+                }).save(self.redis_client)
+
+        response = self.client.get('/api/search?q=payments')
+        self.assertEqual(response.status_code, 200)
+        results = response.json['results']
+        self.assertEqual([result['filename'] for result in results], ["Fintech Deck.pdf", "Backend Engineer.pdf"])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+        self.assertIn("<mark>payments</mark> &amp; FX", results[0]['snippet'])
+        self.assertNotIn('content', results[0])
+        self.assertIsNone(response.json['next_offset'])
+
+        response = self.client.get('/api/search?q=payments&document_type=resume')
+        self.assertEqual([result['filename'] for result in response.json['results']], ["Backend Engineer.pdf"])
+        response = self.client.get('/api/search?q=payments&limit=1')
+        self.assertEqual(response.json['next_offset'], 1)
+        self.assertEqual(self.client.get('/api/search?q=').status_code, 400)
+
+    def test_dashboard_cache_write_through(self):
+        analysis = {
+            'word_count': 2,
+            'char_count': 12,
+            'sentiment_score': 0.5,
+            'sentiment_type': 'Positive',
+            'document_type': 'pitch_deck'
+        }
+        with self.app.app_context():
+            pitch_deck = PitchDeck(filename="Cached Deck.pdf", content="Test content", slide_count=1,
+                                   analysis=analysis)
+            document_id = pitch_deck.save(self.redis_client)
+
+            self.assertIsNotNone(self.redis_client.zscore('dashboard:index', f"{document_id:012d}"))
+            cached = self.redis_client.hgetall(f"dashboard:doc:{document_id}")
+            self.assertEqual(json.loads(cached['filename']), "Cached Deck.pdf")
+            self.assertNotIn('content', cached)
+
+            self.assertEqual(PitchDeck.warm_cache(self.redis_client), 1)
+            self.assertEqual(self.redis_client.get('dashboard:warm'), 'complete')
+
+            pitch_deck.delete(self.redis_client)
+            self.assertIsNone(self.redis_client.zscore('dashboard:index', f"{document_id:012d}"))
+            self.assertFalse(self.redis_client.exists(f"dashboard:doc:{document_id}"))
+
+    def test_database_save_all_keeps_good_rows(self):
+        analysis = {
+            'word_count': 2,
+            'char_count': 12,
+            'sentiment_score': 0.5,
+            'sentiment_type': 'Positive',
+            'document_type': 'pitch_deck'
+        }
+        with self.app.app_context():
+            good = [PitchDeck(filename=f"Deck {i}.pdf", content="Test content", slide_count=1, analysis=analysis)
+                    for i in range(3)]
+            bad = PitchDeck(filename=None, content="Test content", slide_count=1, analysis=analysis)
+            saved, failed = PitchDeck.save_all(good[:2] + [bad] + good[2:], self.redis_client)
+
+            self.assertEqual([pitch_deck.filename for pitch_deck in saved], ["Deck 0.pdf", "Deck 1.pdf", "Deck 2.pdf"])
+            self.assertEqual(len(failed), 1)
+            self.assertIs(failed[0][0], bad)
+            self.assertEqual(PitchDeck.query.count(), 3)
+            self.assertEqual(self.redis_client.zcard('dashboard:index'), 3)
+
+    def test_segments_are_stored_and_reanalyzed(self):
+        parser = PitchDeckParser(sia=SentimentIntensityAnalyzer())
+        segments = parser.pdf_segments(self.test_generic_pdf_path)
+        context = parser.segment_context(segments)
+        analysis = parser.analyze_content(context)
+        self.assertEqual(context.text, parser.parse_pdf(self.test_generic_pdf_path)[0])
+
+        with self.app.app_context():
+            pitch_deck = PitchDeck("Uber.pdf", context.text, len(segments), analysis,
+                                   segments=[DocumentSegment.from_segment(segment, 'page') for segment in segments])
+            legacy = PitchDeck("Legacy.pdf", context.text, len(segments), analysis)
+            PitchDeck.save_all([pitch_deck, legacy], self.redis_client)
+            legacy.analysis_version = None
+            db.session.commit()
+            document_id, legacy_id = pitch_deck.id, legacy.id
+            stored = db.session.get(PitchDeck, document_id)
+            self.assertEqual([segment.position for segment in stored.segments], list(range(1, len(segments) + 1)))
+            self.assertEqual(stored.segments[1].tokens, segments[1]['tokens'])
+            self.assertEqual(len(stored.segments[1].tags), len(segments[1]['tokens']))
+
+            # Only the legacy document is behind; it gets one segment holding its content
+            self.assertEqual(reanalyze.reanalyze(parser, self.redis_client), 1)
+            legacy = db.session.get(PitchDeck, legacy_id)
+            self.assertEqual(legacy.analysis_version, ANALYSIS_VERSION)
+            self.assertEqual([segment.kind for segment in legacy.segments], ['document'])
+
+            expected = db.session.get(PitchDeck, document_id).to_summary()
+            self.assertEqual(reanalyze.reanalyze(parser, self.redis_client, reanalyze_all=True), 2)
+            self.assertEqual(db.session.get(PitchDeck, document_id).to_summary(), expected)
+
+    def test_batch_ingest_resumes_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            archive_path = os.path.join(workdir, "archive.zip")
+            with zipfile.ZipFile(archive_path, 'w') as archive:
+                archive.write(self.test_pdf_path, "resumes/Data Engineer.pdf")
+                archive.write(self.test_generic_pdf_path, "decks/Assessment.pdf")
+                archive.write(self.test_generic_pdf_path, "decks/Assessment copy.pdf")
+                archive.writestr("decks/broken.pdf", b"not a pdf")
+                archive.writestr("notes.txt", b"skipped")
+            checkpoint_path = os.path.join(workdir, "archive.checkpoint")
+
+            with self.app.app_context():
+                stats = ingest.ingest(archive_path, self.redis_client, checkpoint_path, processes=2, batch_size=2)
+                self.assertEqual((stats['stored'], stats['failed'], stats['skipped']), (3, 1, 0))
+                self.assertEqual(ingest.read_checkpoint(checkpoint_path),
+                                 {"resumes/Data Engineer.pdf", "decks/Assessment.pdf", "decks/Assessment copy.pdf"})
+                original = PitchDeck.query.filter_by(filename="Assessment.pdf").one()
+                copy = PitchDeck.query.filter_by(filename="Assessment_copy.pdf").one()
+                self.assertEqual(copy.content_hash, original.content_hash)
+                self.assertEqual(len(copy.segments), original.slide_count)
+                self.assertEqual(PitchDeck.query.filter_by(filename="Data_Engineer.pdf").one().document_type,
+                                 'resume')
+
+                # Everything but the broken file is in the checkpoint, so a second run only retries that one
+                stats = ingest.ingest(archive_path, self.redis_client, checkpoint_path, processes=2)
+                self.assertEqual((stats['stored'], stats['failed'], stats['skipped']), (0, 1, 3))
+                self.assertEqual(PitchDeck.query.count(), 3)
+
+                # A run that stored its documents but died before writing the checkpoint does not store them twice
+                os.remove(checkpoint_path)
+                stats = ingest.ingest(archive_path, self.redis_client, checkpoint_path, processes=2)
+                self.assertEqual((stats['stored'], stats['failed'], stats['skipped']), (3, 1, 0))
+                self.assertEqual(PitchDeck.query.count(), 3)
+
+    def test_pipeline_benchmark_runs_end_to_end(self):
+        # In its own process, since the benchmark swaps Redis and the database for in-process stand-ins
+        with tempfile.TemporaryDirectory() as workdir:
+            run = subprocess.run([sys.executable, '-c', "import sys; from benchmarks import bench_pipeline; "
+                                  "sys.exit(bench_pipeline.main(sys.argv[1:]))", '--documents', '2', '--slides', '2',
+                                  '--words', '20', '--baseline', os.path.join(workdir, 'baseline.json')],
+                                 capture_output=True, text=True, timeout=600)
+        self.assertEqual(run.returncode, 0, run.stderr)
+        self.assertIn('no baseline at', run.stdout)
+        if 'fakeredis is not installed' not in run.stdout:
+            self.assertIn('worker: 2 stored, 0 failed', run.stdout)
+
     def test_database_update(self):
         analysis = {
             'word_count': 2,